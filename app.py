@@ -1,15 +1,24 @@
 import logging
 import os
-import smtplib
+import uuid
 from datetime import datetime, timedelta
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
 
 import pytz
 import streamlit as st
 from dotenv import load_dotenv
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+
+from applog import read_log_tail, setup_logging
+from availability import Schedule
+from availability_cache import availability_cache, availability_refresher
+from booking import book_slots, build_event_body, insert_event
+from booking_log import EMAIL_QUEUED, EMAIL_SENT, EVENT_CREATED, get_booking_log
+from calendar_service import service_cache
+from calendar_sync import compute_slot_grid, get_event_store
+from metrics import metrics
+from notifications import email_outbox, get_smtp_pool, send_booking_emails
+from reservations import get_reservations
+from slot_picker import slot_picker
+from styles import inject_styles
 
 # Настройка страницы (должна быть первой командой Streamlit)
 st.set_page_config(
@@ -19,39 +28,74 @@ st.set_page_config(
     initial_sidebar_state="collapsed",
 )
 
-# Создаем директорию для логов, если её нет
-logs_dir = os.path.join(os.getcwd(), "logs")
-if not os.path.exists(logs_dir):
-    os.makedirs(logs_dir)
-
 # Полный путь к файлу логов
-log_file = os.path.join(logs_dir, "email_logs.txt")
-
-# Настройка логирования
-logging.basicConfig(
-    filename=log_file,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    encoding="utf-8",
+log_file = os.path.join(os.getcwd(), "logs", "email_logs.txt")
+
+# Настройка логирования: запись в файл идет в фоновом потоке, файл
+# ротируется по размеру (или по времени), старые файлы сжимаются
+setup_logging(
+    log_file,
+    max_bytes=int(st.secrets.get("log_max_mb", 5)) * 1024 * 1024,
+    backups=int(st.secrets.get("log_backups", 10)),
+    when=st.secrets.get("log_rotate_when"),
 )
 
 # Выводим информацию о расположении файла логов
 st.sidebar.markdown("### Информация о логах")
 st.sidebar.info(f"Файл логов: {log_file}")
 
-# Добавляем кнопку для просмотра логов
-if st.sidebar.button("Показать логи"):
+# Просмотр логов: последние строки файла, постранично к началу
+LOG_PAGE_LINES = 100
+LOG_LEVELS = {"Все": None, "INFO": "INFO", "WARNING": "WARNING", "ERROR": "ERROR"}
+
+
+def reset_log_pages():
+    # Стек смещений просмотренных страниц; None — конец файла
+    st.session_state.log_pages = [None]
+
+
+def render_log_viewer():
+    """Показывает в боковой панели страницу лога с фильтрами"""
+    if "log_pages" not in st.session_state:
+        reset_log_pages()
+
+    level = st.sidebar.selectbox(
+        "Уровень", list(LOG_LEVELS), key="log_level", on_change=reset_log_pages
+    )
+    contains = st.sidebar.text_input(
+        "Фильтр (email или текст)", key="log_filter", on_change=reset_log_pages
+    )
     try:
-        with open(log_file, "r", encoding="utf-8") as f:
-            logs = f.read()
-            if logs:
-                st.sidebar.code(logs)
-            else:
-                st.sidebar.info("Файл логов пуст")
+        lines, older = read_log_tail(
+            log_file,
+            LOG_PAGE_LINES,
+            before=st.session_state.log_pages[-1],
+            level=LOG_LEVELS[level],
+            contains=contains or None,
+        )
     except FileNotFoundError:
         st.sidebar.error("Файл логов не найден")
+        return
     except Exception as e:
         st.sidebar.error(f"Ошибка при чтении логов: {str(e)}")
+        return
+
+    if lines:
+        st.sidebar.code("\n".join(lines))
+    else:
+        st.sidebar.info("Подходящих записей нет")
+
+    newer_col, older_col = st.sidebar.columns(2)
+    if newer_col.button("Новее", disabled=len(st.session_state.log_pages) == 1):
+        st.session_state.log_pages.pop()
+        st.rerun()
+    if older_col.button("Раньше", disabled=older is None):
+        st.session_state.log_pages.append(older)
+        st.rerun()
+
+
+if st.sidebar.toggle("Показать логи", key="show_logs"):
+    render_log_viewer()
 
 
 # Функция для логирования
@@ -72,779 +116,9 @@ def log_email_operation(message, level="info"):
 # Загрузка переменных окружения
 load_dotenv()
 
-# Добавляем CSS стили
-st.markdown(
-    """
-<style>
-    .header-container {
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        margin: 2rem auto;
-        flex-direction: column;
-        max-width: 800px;
-        background-color: #2b2b2b;
-        padding: 2rem;
-        border-radius: 8px;
-        border: 1px solid #3c3f41;
-    }
-    .stButton button {
-        width: 100%;
-        border-radius: 4px;
-        background-color: #2b2b2b;
-        border: 1px solid #3c3f41;
-        padding: 8px 4px;
-        font-size: 0.9rem;
-        transition: all 0.2s ease;
-        margin: 1px 0;
-        color: #a9b7c6;
-    }
-    .stButton button:hover {
-        background-color: #4dabf7;
-        color: #2b2b2b;
-        border-color: #4dabf7;
-        transform: translateY(-1px);
-    }
-    .date-header {
-        background-color: #323232;
-        color: #a9b7c6;
-        padding: 10px 15px;
-        border-radius: 4px;
-        margin: 12px 0 8px;
-        font-size: 0.9rem;
-        border: 1px solid #3c3f41;
-    }
-    .booking-form {
-        background-color: #2b2b2b;
-        padding: 25px;
-        border-radius: 8px;
-        margin-top: 30px;
-        border: 1px solid #3c3f41;
-    }
-    h1 {
-        color: #4dabf7;
-        text-align: center;
-        margin: 0;
-        font-size: 2rem;
-        font-weight: 600;
-        letter-spacing: 1px;
-    }
-    .subtitle {
-        color: #a9b7c6;
-        text-align: center;
-        margin: 0.5rem 0 0;
-        font-size: 1.1rem;
-        font-weight: 400;
-        opacity: 0.9;
-    }
-    .calendar-container {
-        background-color: #2b2b2b;
-        padding: 20px;
-        border-radius: 8px;
-        border: 1px solid #3c3f41;
-        margin: 0 -1rem;
-    }
-    .date-header h3 {
-        margin: 0;
-        font-size: 1rem;
-        font-weight: 500;
-        color: #a9b7c6;
-    }
-    .slot-grid {
-        display: grid;
-        grid-template-columns: repeat(6, 1fr);
-        gap: 6px;
-        padding: 6px 0;
-    }
-    .stApp {
-        background-color: #1e1f22;
-    }
-    div[data-testid="stToolbar"] {
-        display: none;
-    }
-    #MainMenu {
-        display: none;
-    }
-    footer {
-        display: none;
-    }
-    div[data-testid="stDecoration"] {
-        display: none;
-    }
-    div[data-testid="stStatusWidget"] {
-        display: none;
-    }
-    .stApp > header {
-        display: none;
-    }
-    .stForm button {
-        background-color: #4dabf7;
-        color: #2b2b2b;
-        font-weight: 500;
-        padding: 10px 20px;
-        width: 100%;
-        margin-top: 10px;
-        font-size: 1rem;
-    }
-    .stForm button:hover {
-        background-color: #339af0;
-        border-color: #339af0;
-    }
-    .form-description {
-        color: #a9b7c6;
-        font-size: 0.9rem;
-        margin: 10px 0;
-        opacity: 0.8;
-    }
-    .form-header {
-        color: #4dabf7;
-        font-size: 1.2rem;
-        margin-bottom: 15px;
-        font-weight: 500;
-    }
-    /* Darcula theme additional styles */
-    .stTextInput input {
-        background-color: #2b2b2b !important;
-        color: #a9b7c6 !important;
-        border: 1px solid #3c3f41 !important;
-        padding: 10px !important;
-        font-size: 1rem !important;
-    }
-    .stTextInput input:focus {
-        border-color: #4dabf7 !important;
-        box-shadow: none !important;
-    }
-    div[data-baseweb="base-input"] {
-        background-color: #2b2b2b !important;
-    }
-    .stMarkdown {
-        color: #a9b7c6 !important;
-    }
-    p {
-        color: #a9b7c6 !important;
-    }
-    .stAlert {
-        background-color: #2b2b2b !important;
-        color: #a9b7c6 !important;
-        border: 1px solid #3c3f41 !important;
-    }
-    .stAlert > div {
-        color: #a9b7c6 !important;
-    }
-    /* Fix for streamlit components */
-    button[kind="primary"] {
-        background-color: #4dabf7 !important;
-        color: #2b2b2b !important;
-    }
-    button[kind="primary"]:hover {
-        background-color: #339af0 !important;
-    }
-    .stButton button.unavailable {
-        background-color: #3c2222 !important;
-        color: #ff6b6b !important;
-        border-color: #ff6b6b !important;
-        cursor: not-allowed !important;
-        opacity: 0.7;
-    }
-    .stButton button.unavailable:hover {
-        background-color: #3c2222 !important;
-        color: #ff6b6b !important;
-        border-color: #ff6b6b !important;
-        transform: none !important;
-    }
-    button.unavailable {
-        background-color: #3c2222 !important;
-        color: #ff6b6b !important;
-        border: 1px solid #ff6b6b !important;
-        cursor: not-allowed !important;
-        opacity: 0.7 !important;
-        pointer-events: none !important;
-    }
-    button.unavailable:hover {
-        background-color: #3c2222 !important;
-        color: #ff6b6b !important;
-        border-color: #ff6b6b !important;
-        transform: none !important;
-    }
-    .slot-status {
-        display: flex;
-        gap: 20px;
-        margin: 20px 0;
-        justify-content: center;
-    }
-    .status-item {
-        display: flex;
-        align-items: center;
-        gap: 8px;
-    }
-    .status-dot {
-        width: 12px;
-        height: 12px;
-        border-radius: 50%;
-    }
-    .status-dot.available {
-        background: rgba(43, 43, 43, 0.7);
-        border: 1px solid rgba(255, 215, 0, 0.1);
-    }
-    .status-dot.unavailable {
-        background: linear-gradient(145deg, #dc3545, #c82333);
-    }
-    /* Стили для контейнера сообщений */
-    .messages-container {
-        position: fixed;
-        top: 20px;
-        right: 20px;
-        width: 300px;
-        z-index: 9999;
-        background: rgba(43, 43, 43, 0.95);
-        border-radius: 8px;
-        border: 1px solid rgba(255, 215, 0, 0.2);
-        backdrop-filter: blur(10px);
-        padding: 10px;
-        max-height: 80vh;
-        overflow-y: auto;
-    }
-
-    .message {
-        padding: 10px;
-        margin-bottom: 10px;
-        border-radius: 6px;
-        font-size: 0.9rem;
-        animation: fadeIn 0.3s ease;
-    }
-
-    .message.info {
-        background: rgba(13, 110, 253, 0.2);
-        border: 1px solid rgba(13, 110, 253, 0.3);
-        color: #8bb9fe;
-    }
-
-    .message.success {
-        background: rgba(25, 135, 84, 0.2);
-        border: 1px solid rgba(25, 135, 84, 0.3);
-        color: #75b798;
-    }
-
-    .message.error {
-        background: rgba(220, 53, 69, 0.2);
-        border: 1px solid rgba(220, 53, 69, 0.3);
-        color: #ea868f;
-    }
-
-    @keyframes fadeIn {
-        from { opacity: 0; transform: translateY(-10px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
-
-    /* Увеличиваем время отображения стандартных уведомлений */
-    div[data-testid="stNotificationContent"] {
-        animation: none !important;
-        transition: opacity 0.5s ease !important;
-    }
-
-    /* Стили для слотов */
-    .stButton > button {
-        width: 100%;
-        padding: 10px;
-        margin: 5px 0;
-        border: none;
-        border-radius: 5px;
-        cursor: pointer;
-        font-size: 14px;
-        transition: all 0.3s ease;
-        text-align: center;
-        color: #a9b7c6;
-        background: rgba(43, 43, 43, 0.7);
-        border: 1px solid rgba(255, 215, 0, 0.1);
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        position: relative;
-        overflow: hidden;
-    }
-
-    .stButton > button:hover {
-        transform: translateY(-2px) scale(1.02);
-        box-shadow: 0 4px 15px rgba(255, 165, 0, 0.3);
-        background: rgba(255, 165, 0, 0.2) !important;
-        border-color: rgba(255, 165, 0, 0.4) !important;
-        animation: pulse 1.5s infinite;
-    }
-
-    /* Стиль для выбранного слота */
-    .stButton > button[aria-pressed="true"] {
-        background: rgba(255, 165, 0, 0.4) !important;
-        border-color: rgba(255, 165, 0, 0.6) !important;
-        color: #ffffff !important;
-        box-shadow: 0 4px 20px rgba(255, 165, 0, 0.4);
-        transform: translateY(-2px) scale(1.02);
-    }
-
-    @keyframes pulse {
-        0% {
-            box-shadow: 0 4px 15px rgba(255, 165, 0, 0.3);
-        }
-        50% {
-            box-shadow: 0 4px 20px rgba(255, 165, 0, 0.4);
-        }
-        100% {
-            box-shadow: 0 4px 15px rgba(255, 165, 0, 0.3);
-        }
-    }
-
-    .stButton > button::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: -100%;
-        width: 100%;
-        height: 100%;
-        background: linear-gradient(
-            90deg,
-            transparent,
-            rgba(255, 165, 0, 0.2),
-            transparent
-        );
-        transition: 0.5s;
-    }
-
-    .stButton > button:hover::before {
-        left: 100%;
-    }
-
-    .stButton > button.unavailable {
-        background: linear-gradient(145deg, #dc3545, #c82333) !important;
-        cursor: not-allowed;
-        opacity: 0.7;
-    }
-
-    .stButton > button.unavailable:hover {
-        transform: none;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        background: linear-gradient(145deg, #dc3545, #c82333) !important;
-        animation: none;
-    }
-
-    .stButton > button.unavailable::before {
-        display: none;
-    }
-
-    /* Анимированный градиентный фон */
-    [data-testid="stAppViewContainer"] {
-        background: linear-gradient(-45deg, #1e1e1e, #2b2b2b, #1e1e1e, #2d2d2d);
-        background-size: 400% 400%;
-        animation: gradientBG 15s ease infinite;
-    }
-
-    @keyframes gradientBG {
-        0% {
-            background-position: 0% 50%;
-        }
-        50% {
-            background-position: 100% 50%;
-        }
-        100% {
-            background-position: 0% 50%;
-        }
-    }
-
-    /* Улучшенный заголовок */
-    .header-container {
-        text-align: center;
-        padding: 3rem 1.5rem;
-        margin-bottom: 2.5rem;
-        background: rgba(43, 43, 43, 0.9);
-        border-radius: 20px;
-        backdrop-filter: blur(25px);
-        border: 1px solid rgba(255, 215, 0, 0.2);
-        box-shadow: 0 10px 40px rgba(0, 0, 0, 0.3);
-        transition: all 0.5s cubic-bezier(0.4, 0, 0.2, 1);
-        animation: fadeInDown 1s ease-out;
-    }
-    
-    @keyframes fadeInDown {
-        from {
-            opacity: 0;
-            transform: translateY(-20px);
-        }
-        to {
-            opacity: 1;
-            transform: translateY(0);
-        }
-    }
-    
-    .header-container:hover {
-        border-color: rgba(255, 215, 0, 0.4);
-        box-shadow: 0 15px 50px rgba(255, 215, 0, 0.2);
-        transform: translateY(-8px);
-    }
-    
-    .header-container h1 {
-        font-size: 2.5rem;
-        font-weight: 900;
-        margin-bottom: 0.8rem;
-        background: linear-gradient(120deg, 
-            #ffd700 0%, 
-            #ffc107 25%, 
-            #ffab00 50%,
-            #ffd700 75%,
-            #ffc107 100%);
-        background-size: 200% auto;
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        text-shadow: 3px 3px 6px rgba(0, 0, 0, 0.4);
-        letter-spacing: 2px;
-        line-height: 1.4;
-        animation: shine 3s linear infinite;
-    }
-    
-    @keyframes shine {
-        to {
-            background-position: 200% center;
-        }
-    }
-    
-    .subtitle {
-        font-size: 1.4rem;
-        margin: 1.2rem 0;
-        letter-spacing: 3px;
-        font-weight: 600;
-        text-transform: uppercase;
-        background: linear-gradient(120deg, 
-            #ffffff 0%, 
-            #e0e0e0 50%,
-            #ffffff 100%);
-        background-size: 200% auto;
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        opacity: 0.95;
-        text-shadow: 2px 2px 4px rgba(0, 0, 0, 0.3);
-        animation: shine 4s linear infinite, pulse 2s ease-in-out infinite;
-    }
-    
-    .form-description {
-        color: #e0e0e0;
-        line-height: 1.8;
-        font-size: 1.1rem;
-        margin: 2rem 0 0;
-        max-width: 800px;
-        margin-left: auto;
-        margin-right: auto;
-        opacity: 0.9;
-        text-shadow: 1px 1px 2px rgba(0, 0, 0, 0.2);
-    }
-
-    @keyframes pulse {
-        0% {
-            transform: scale(1);
-            text-shadow: 2px 2px 4px rgba(0, 0, 0, 0.3);
-        }
-        50% {
-            transform: scale(1.05);
-            text-shadow: 3px 3px 6px rgba(255, 215, 0, 0.4);
-        }
-        100% {
-            transform: scale(1);
-            text-shadow: 2px 2px 4px rgba(0, 0, 0, 0.3);
-        }
-    }
-
-    /* Улучшенные кнопки слотов */
-    .stButton > button {
-        width: 100%;
-        padding: 12px;
-        margin: 5px 0;
-        border: none;
-        border-radius: 8px;
-        cursor: pointer;
-        font-size: 14px;
-        transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1);
-        text-align: center;
-        color: #a9b7c6;
-        background: rgba(43, 43, 43, 0.7);
-        border: 1px solid rgba(255, 215, 0, 0.1);
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        position: relative;
-        overflow: hidden;
-        backdrop-filter: blur(10px);
-    }
-
-    .stButton > button:hover {
-        transform: translateY(-3px) scale(1.02);
-        box-shadow: 0 8px 15px rgba(255, 165, 0, 0.3);
-        background: rgba(255, 165, 0, 0.15) !important;
-        border-color: rgba(255, 165, 0, 0.4) !important;
-        animation: pulseGlow 2s infinite;
-    }
-
-    @keyframes pulseGlow {
-        0% {
-            box-shadow: 0 4px 15px rgba(255, 165, 0, 0.3);
-        }
-        50% {
-            box-shadow: 0 4px 25px rgba(255, 165, 0, 0.5);
-        }
-        100% {
-            box-shadow: 0 4px 15px rgba(255, 165, 0, 0.3);
-        }
-    }
-
-    /* Эффект свечения при наведении */
-    .stButton > button::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: -100%;
-        width: 100%;
-        height: 100%;
-        background: linear-gradient(
-            90deg,
-            transparent,
-            rgba(255, 165, 0, 0.2),
-            transparent
-        );
-        transition: 0.8s;
-        transform: skewX(-15deg);
-    }
-
-    .stButton > button:hover::before {
-        left: 100%;
-        transition: 0.8s;
-    }
-
-    /* Улучшенные индикаторы статуса */
-    .slot-status {
-        display: flex;
-        gap: 30px;
-        margin: 20px 0;
-        justify-content: center;
-        padding: 15px;
-        background: rgba(43, 43, 43, 0.8);
-        border-radius: 12px;
-        backdrop-filter: blur(10px);
-        border: 1px solid rgba(255, 215, 0, 0.1);
-        transform: translateY(0);
-        transition: all 0.3s ease;
-    }
-
-    .slot-status:hover {
-        transform: translateY(-2px);
-        border-color: rgba(255, 215, 0, 0.2);
-    }
-
-    .status-item {
-        display: flex;
-        align-items: center;
-        gap: 10px;
-        padding: 8px 16px;
-        border-radius: 8px;
-        background: rgba(0, 0, 0, 0.2);
-        transition: all 0.3s ease;
-    }
-
-    .status-item:hover {
-        background: rgba(0, 0, 0, 0.3);
-        transform: translateY(-1px);
-    }
-
-    .status-dot {
-        width: 12px;
-        height: 12px;
-        border-radius: 50%;
-        transition: all 0.3s ease;
-    }
-
-    .status-dot.available {
-        background: rgba(43, 43, 43, 0.7);
-        border: 1px solid rgba(255, 215, 0, 0.1);
-        animation: glowPulse 2s infinite;
-    }
-
-    @keyframes glowPulse {
-        0% {
-            box-shadow: 0 0 5px rgba(255, 215, 0, 0.3);
-        }
-        50% {
-            box-shadow: 0 0 10px rgba(255, 215, 0, 0.5);
-        }
-        100% {
-            box-shadow: 0 0 5px rgba(255, 215, 0, 0.3);
-        }
-    }
-
-    /* Улучшенная форма бронирования */
-    .booking-form {
-        background: rgba(43, 43, 43, 0.8);
-        border-radius: 16px;
-        padding: 2rem;
-        margin: 1rem 0;
-        border: 1px solid rgba(255, 215, 0, 0.1);
-        backdrop-filter: blur(20px);
-        transform: translateY(0);
-        transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1);
-        animation: slideUp 0.5s ease-out;
-    }
-
-    .booking-form:hover {
-        transform: translateY(-5px);
-        border-color: rgba(255, 215, 0, 0.2);
-        box-shadow: 0 8px 32px rgba(255, 215, 0, 0.1);
-    }
-
-    @keyframes slideUp {
-        from {
-            opacity: 0;
-            transform: translateY(20px);
-        }
-        to {
-            opacity: 1;
-            transform: translateY(0);
-        }
-    }
-
-    /* Улучшенные поля ввода */
-    .stTextInput > div > div {
-        background: rgba(43, 43, 43, 0.7) !important;
-        border: 1px solid rgba(255, 215, 0, 0.1) !important;
-        border-radius: 8px !important;
-        transition: all 0.3s ease !important;
-    }
-
-    .stTextInput > div > div:hover,
-    .stTextInput > div > div:focus-within {
-        border-color: rgba(255, 215, 0, 0.3) !important;
-        box-shadow: 0 0 15px rgba(255, 215, 0, 0.1) !important;
-    }
-
-    /* Улучшенные уведомления */
-    .stAlert {
-        background: rgba(43, 43, 43, 0.8) !important;
-        backdrop-filter: blur(10px) !important;
-        border-radius: 12px !important;
-        border: 1px solid rgba(255, 215, 0, 0.1) !important;
-        animation: slideIn 0.5s ease-out !important;
-    }
-
-    @keyframes slideIn {
-        from {
-            opacity: 0;
-            transform: translateX(20px);
-        }
-        to {
-            opacity: 1;
-            transform: translateX(0);
-        }
-    }
-
-    /* Медиа-запросы для мобильных устройств */
-    @media screen and (max-width: 768px) {
-        .header-container {
-            padding: 2rem 0.8rem;
-            margin-bottom: 2rem;
-            border-radius: 16px;
-        }
-        
-        .header-container h1 {
-            font-size: 1.8rem;
-            letter-spacing: 1px;
-            margin-bottom: 1rem;
-            line-height: 1.3;
-            padding: 0 0.3rem;
-        }
+# Стили страницы из static/styles.css (отдаются как статический файл)
+inject_styles()
 
-        .mobile-break {
-            display: block;
-        }
-        
-        .subtitle {
-            font-size: 1.2rem;
-            letter-spacing: 1.5px;
-            margin: 1rem 0;
-            line-height: 1.6;
-            padding: 0 0.5rem;
-            word-spacing: 2px;
-        }
-        
-        .form-description {
-            font-size: 0.9rem;
-            line-height: 1.5;
-            margin: 1.5rem 0 0;
-            padding: 0 0.8rem;
-        }
-    }
-
-    /* Медиа-запросы для маленьких мобильных устройств */
-    @media screen and (max-width: 480px) {
-        .header-container {
-            padding: 1.5rem 0.6rem;
-            margin-bottom: 1.5rem;
-        }
-        
-        .header-container h1 {
-            font-size: 1.6rem;
-            letter-spacing: 0.5px;
-            padding: 0 0.2rem;
-        }
-        
-        .subtitle {
-            font-size: 1.1rem;
-            letter-spacing: 1px;
-            padding: 0 0.3rem;
-            word-spacing: 1px;
-        }
-        
-        .form-description {
-            font-size: 0.85rem;
-            line-height: 1.4;
-            margin: 1.2rem 0 0;
-            padding: 0 0.5rem;
-        }
-    }
-
-    /* Для очень маленьких экранов */
-    @media screen and (max-width: 360px) {
-        .header-container h1 {
-            font-size: 1.4rem;
-            letter-spacing: 0px;
-            padding: 0 0.2rem;
-        }
-        
-        .subtitle {
-            font-size: 1rem;
-            letter-spacing: 0.5px;
-            word-spacing: 1px;
-        }
-    }
-
-    /* Для десктопов */
-    @media screen and (min-width: 769px) {
-        .mobile-break {
-            display: none;
-        }
-        
-        .header-container h1 {
-            font-size: 2.5rem;
-            margin-bottom: 1.5rem;
-        }
-        
-        .subtitle {
-            font-size: 1.6rem;
-            letter-spacing: 2px;
-            word-spacing: 4px;
-            margin: 1.5rem 0;
-        }
-    }
-</style>
-""",
-    unsafe_allow_html=True,
-)
-
-# Скрываем меню и футер
-hide_streamlit_style = """
-<style>
-#MainMenu {visibility: hidden;}
-footer {visibility: hidden;}
-</style>
-"""
-st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
 # Настройки из Streamlit secrets
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
@@ -853,6 +127,43 @@ GMAIL_SENDER = st.secrets["gmail_sender"]
 GMAIL_APP_PASSWORD = st.secrets["gmail_app_password"]
 CLIENT_ID = st.secrets["google_client_id"]
 CLIENT_SECRET = st.secrets["google_client_secret"]
+# Источник занятости: "events" (события с учетом отклоненных приглашений)
+# или "freebusy" (компактные диапазоны занятости)
+AVAILABILITY_BACKEND = st.secrets.get("availability_backend", "events")
+# Время жизни общего снимка доступности в секундах
+AVAILABILITY_CACHE_TTL = st.secrets.get("availability_cache_ttl", 60)
+# Интервал фонового обновления доступности в секундах (0 — отключено)
+AVAILABILITY_REFRESH_INTERVAL = st.secrets.get("availability_refresh_interval", 30)
+# Предельный возраст снимка при фоновом обновлении в секундах: если поток
+# обновления долго не может получить данные, страница считает их сама
+AVAILABILITY_MAX_STALENESS = st.secrets.get("availability_max_staleness", 300)
+
+
+@st.cache_resource
+def get_schedule():
+    """Расписание встреч из секции schedule секретов (шаблон слотов считается один раз)"""
+    return Schedule.from_config(st.secrets.get("schedule", {}))
+
+
+# Длительность, шаг, рабочие часы, праздники, буфер и длина окна бронирования
+SCHEDULE = get_schedule()
+BOOKING_WINDOW_DAYS = SCHEDULE.window_days
+# Сколько рабочих дней показывается без отметки «Показать все доступные дни»
+PREVIEW_DAYS = 3
+
+# Таблица резервов слотов: в памяти процесса или в SQLite, если указан путь
+reservations = get_reservations(st.secrets.get("reservations_db"), SCHEDULE.buffer)
+
+# Замеры длительности этапов (выключены по умолчанию, без накладных расходов)
+metrics.enabled = bool(st.secrets.get("metrics_enabled", False))
+if metrics.enabled and st.secrets.get("metrics_file"):
+    # Файл в текстовом формате Prometheus (например, для textfile collector)
+    metrics.start_export(st.secrets["metrics_file"])
+
+# Структурированный журнал исходов бронирования и отправки писем
+booking_log = get_booking_log(
+    st.secrets.get("booking_log_db", os.path.join(os.getcwd(), "booking_events.db"))
+)
 
 # Удаляем отладочную информацию
 # st.write(f"Email отправителя: {GMAIL_SENDER}")
@@ -899,21 +210,15 @@ def get_calendar_service():
             st.error("❌ Отсутствуют необходимые учетные данные OAuth")
             return None
 
-        # Создаем объект Credentials с refresh token
-        creds = Credentials(
-            None,  # access token изначально None
-            refresh_token=st.secrets["google_refresh_token"],
-            token_uri=st.secrets["token_uri"],
+        # Сервис и access token переиспользуются между вызовами и сессиями,
+        # токен обновляется только при приближении срока его действия
+        return service_cache.get(
             client_id=st.secrets["google_client_id"],
             client_secret=st.secrets["google_client_secret"],
-            scopes=["https://www.googleapis.com/auth/calendar"],
+            refresh_token=st.secrets["google_refresh_token"],
+            token_uri=st.secrets["token_uri"],
         )
 
-        # При первом использовании creds автоматически запросит новый access token
-        # используя refresh token
-        service = build("calendar", "v3", credentials=creds)
-        return service
-
     except Exception as e:
         st.error(f"❌ Ошибка при создании сервиса: {str(e)}")
         return None
@@ -921,6 +226,8 @@ def get_calendar_service():
 
 def get_credentials():
     """Получает учетные данные для доступа к Google Calendar API."""
+    from google.oauth2.credentials import Credentials
+
     try:
         # Проверяем наличие учетных данных в секретах
         if all(
@@ -949,10 +256,8 @@ def get_credentials():
         return None
 
 
-def get_free_slots():
-    """Получение свободных и занятых слотов из календаря"""
-    service = get_calendar_service()
-
+def get_booking_window():
+    """Возвращает начало и конец окна бронирования"""
     # Устанавливаем московский часовой пояс
     moscow_tz = pytz.timezone("Europe/Moscow")
     now = datetime.now(moscow_tz)
@@ -961,106 +266,94 @@ def get_free_slots():
     start_date = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(
         days=1
     )
-    end_date = start_date + timedelta(days=14)
-
-    # Получаем занятые слоты
-    events_result = (
-        service.events()
-        .list(
-            calendarId="primary",  # Используем primary вместо CALENDAR_ID
-            timeMin=start_date.isoformat(),
-            timeMax=end_date.isoformat(),
-            singleEvents=True,
-            orderBy="startTime",
-        )
-        .execute()
-    )
+    end_date = start_date + timedelta(days=BOOKING_WINDOW_DAYS)
+    return start_date, end_date
+
 
-    events = events_result.get("items", [])
-    busy_slots = []
-
-    # Преобразуем события в список занятых слотов
-    for event in events:
-        start = datetime.fromisoformat(
-            event["start"].get("dateTime", event["start"].get("date"))
-        ).astimezone(moscow_tz)
-        end = datetime.fromisoformat(
-            event["end"].get("dateTime", event["end"].get("date"))
-        ).astimezone(moscow_tz)
-
-        # Пропускаем события, где вы не подтвердили участие
-        response_status = next(
-            (
-                attendee["responseStatus"]
-                for attendee in event.get("attendees", [])
-                if attendee.get("self", False)
-            ),
-            event.get("status", "confirmed"),  # Для событий, где вы организатор
+def get_availability_key(days=BOOKING_WINDOW_DAYS):
+    """Ключ снимка доступности первых days дней окна в общем кэше"""
+    start_date, _ = get_booking_window()
+    return ("primary", start_date, days)
+
+
+def get_free_slots(all_days=True):
+    """Получение свободных и занятых слотов из календаря
+
+    Возвращает ключ снимка и сетку слотов. Снимок общий для всех сессий.
+    Если работает фоновое обновление, страница получает последний готовый
+    снимок, даже устаревший (но не старше AVAILABILITY_MAX_STALENESS), и не
+    ждет Google.
+
+    Для сокращенного вида (all_days=False) без готового снимка всего окна
+    синхронно считаются только первые PREVIEW_DAYS рабочих дней, а полное
+    окно загружается в фоне к моменту, когда пользователь раскроет все дни.
+    """
+    key = get_availability_key()
+    if availability_refresher.running:
+        ttl = AVAILABILITY_MAX_STALENESS
+    else:
+        ttl = AVAILABILITY_CACHE_TTL
+    snapshot = availability_cache.peek(key, ttl)
+    if snapshot is not None:
+        return key, snapshot
+
+    start_date, _ = get_booking_window()
+    service = get_calendar_service()
+    if all_days:
+        return key, availability_cache.get_or_compute(
+            key,
+            lambda: compute_free_slots(service, start_date, BOOKING_WINDOW_DAYS),
+            ttl=AVAILABILITY_CACHE_TTL,
         )
 
-        if response_status == "declined":
-            continue
-
-        # Добавляем все часовые слоты в период события
-        current = start
-        while current < end:
-            busy_slots.append(current)
-            current += timedelta(hours=1)
-
-    # Создаем список всех возможных слотов
-    all_slots = []
-    current = start_date
-
-    while current < end_date:
-        # Проверяем только рабочие дни (0 = понедельник, 4 = пятница)
-        if current.weekday() < 5:
-            # Добавляем слоты с 9:00 до 17:00 (последняя встреча в 17:00)
-            day_start = current.replace(hour=9, minute=0)
-            day_end = current.replace(hour=17, minute=0)
-
-            slot_time = day_start
-            while slot_time <= day_end:
-                all_slots.append(slot_time)
-                slot_time += timedelta(hours=1)
-
-        # Переходим к следующему дню
-        current = (current + timedelta(days=1)).replace(hour=0, minute=0)
-
-    # Возвращаем словарь с информацией о статусе каждого слота
-    slots_info = {}
-    for slot in all_slots:
-        slot_end = slot + timedelta(hours=1)
-
-        # Проверяем пересечения с занятыми слотами
-        is_busy = any(
-            (
-                busy <= slot < busy + timedelta(hours=1)
-            )  # Начало слота попадает в занятый период
-            or (
-                busy < slot_end <= busy + timedelta(hours=1)
-            )  # Конец слота попадает в занятый период
-            or (slot <= busy < slot_end)  # Занятый период внутри слота
-            for busy in busy_slots
+    if not availability_refresher.running:
+        # Полное окно считает фоновый поток обновления, если он запущен
+        availability_cache.prefetch(
+            key,
+            lambda: compute_free_slots(service, start_date, BOOKING_WINDOW_DAYS),
+            ttl=AVAILABILITY_CACHE_TTL,
         )
+    preview_days = SCHEDULE.span_days(start_date.date(), PREVIEW_DAYS)
+    preview_key = get_availability_key(preview_days)
+    return preview_key, availability_cache.get_or_compute(
+        preview_key,
+        lambda: compute_free_slots(service, start_date, preview_days),
+        ttl=AVAILABILITY_CACHE_TTL,
+    )
+
+
+def refresh_free_slots(credentials):
+    """Пересчет снимка доступности в фоновом потоке (без обращений к интерфейсу)"""
+    start_date, _ = get_booking_window()
+    return compute_free_slots(
+        service_cache.get(**credentials), start_date, BOOKING_WINDOW_DAYS
+    )
 
-        # Добавляем информацию о слоте
-        slots_info[slot] = {
-            "is_busy": is_busy,
-            "time": slot.strftime("%H:%M"),
-            "date": slot.strftime("%Y-%m-%d"),
-        }
 
-    return slots_info
+def compute_free_slots(service, start_date, days):
+    """Расчет сетки свободных и занятых слотов первых days дней окна"""
+    moscow_tz = pytz.timezone("Europe/Moscow")
+    store = get_event_store("primary", moscow_tz)  # primary вместо CALENDAR_ID
+    return compute_slot_grid(
+        service, store, start_date, days, SCHEDULE, AVAILABILITY_BACKEND
+    )
 
 
 def send_email_notification(slot_time, booker_email):
-    """Отправка уведомления на email"""
+    """Постановка email-уведомления в очередь фоновой доставки"""
     try:
         # Проверяем наличие настроек
         if not GMAIL_SENDER:
             error_msg = log_email_operation(
                 "Не указан email отправителя в настройках", "error"
             )
+            booking_log.record(
+                EMAIL_QUEUED,
+                "config_error",
+                booker_email,
+                email_slot(slot_time),
+                error="gmail_sender",
+            )
             st.session_state.messages.append(("error", error_msg))
             st.error(error_msg)
             return False
@@ -1069,136 +362,91 @@ def send_email_notification(slot_time, booker_email):
             error_msg = log_email_operation(
                 "Не указан пароль приложения Gmail в настройках", "error"
             )
+            booking_log.record(
+                EMAIL_QUEUED,
+                "config_error",
+                booker_email,
+                email_slot(slot_time),
+                error="gmail_app_password",
+            )
             st.session_state.messages.append(("error", error_msg))
             st.error(error_msg)
             return False
 
-        info_msg = log_email_operation(
-            f"Подготовка к отправке email на адрес: {booker_email}"
+        # Письма отправляются фоновым потоком, бронирование не ждет SMTP
+        with metrics.span("email.enqueue"):
+            job_id = email_outbox.enqueue(
+                {
+                    "slot_time": slot_time,
+                    "booker_email": booker_email,
+                    "duration": SCHEDULE.duration_text,
+                }
+            )
+    except Exception as e:
+        error_msg = log_email_operation(
+            f"Общая ошибка при отправке email: {str(e)}", "error"
         )
-        st.session_state.messages.append(("info", info_msg))
-        st.info(info_msg)
-
-        # Создаем основное сообщение
-        msg = MIMEMultipart("alternative")
-        msg["From"] = GMAIL_SENDER
-        msg["To"] = booker_email
-        msg["Subject"] = "🎉 Встреча успешно забронирована!"
-
-        log_email_operation(f"Создано сообщение с темой: {msg['Subject']}")
-
-        # HTML версия письма
-        html_body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; color: #333; max-width: 600px; margin: 0 auto;">
-            <div style="padding: 20px; background: #f8f9fa; border-radius: 10px;">
-                <h2 style="color: #1e88e5; margin-bottom: 20px;">Подтверждение бронирования</h2>
-                
-                <div style="background: white; padding: 20px; border-radius: 8px; margin-bottom: 20px;">
-                    <h3 style="color: #333; margin-top: 0;">Детали встречи:</h3>
-                    <p><strong>📅 Дата и время:</strong> {slot_time}</p>
-                    <p><strong>⏱️ Продолжительность:</strong> 1 час</p>
-                    <p><strong>👥 Участники:</strong> {booker_email}</p>
-                </div>
-                
-                <div style="background: #e3f2fd; padding: 15px; border-radius: 8px; margin-bottom: 20px;">
-                    <h4 style="color: #1e88e5; margin-top: 0;">Что дальше?</h4>
-                    <ul style="margin: 10px 0; padding-left: 20px;">
-                        <li>Вы получите приглашение в Google Calendar</li>
-                        <li>В приглашении будет ссылка на Google Meet</li>
-                        <li>За час до встречи придет напоминание</li>
-                        <li>За 10 минут появится уведомление</li>
-                    </ul>
-                </div>
-                
-                <div style="background: #f5f5f5; padding: 15px; border-radius: 8px;">
-                    <p style="margin: 0;"><strong>Нужно перенести встречу?</strong><br>
-                    Вы можете предложить другое время через Google Calendar.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-
-        # Текстовая версия
-        text_body = f"""
-        🎉 Встреча успешно забронирована!
-
-        📅 Дата и время: {slot_time}
-        ⏱️ Продолжительность: 1 час
-        👥 Участники: {booker_email}
-
-        Что дальше?
-        - Вы получите приглашение в Google Calendar
-        - В приглашении будет ссылка на Google Meet
-        - За час до встречи придет напоминание
-        - За 10 минут появится уведомление
+        booking_log.record(
+            EMAIL_QUEUED, "error", booker_email, email_slot(slot_time), error=str(e)
+        )
+        st.error(error_msg)
+        return False
 
-        Нужно перенести встречу?
-        Вы можете предложить другое время через Google Calendar.
-        """
+    info_msg = log_email_operation(
+        f"Уведомление для {booker_email} поставлено в очередь отправки ({job_id})"
+    )
+    booking_log.record(
+        EMAIL_QUEUED, "ok", booker_email, email_slot(slot_time), job_id=job_id
+    )
+    st.session_state.messages.append(("info", info_msg))
+    return True
 
-        # Добавляем обе версии в письмо
-        msg.attach(MIMEText(text_body, "plain"))
-        msg.attach(MIMEText(html_body, "html"))
-
-        st.info("Подключение к серверу Gmail...")
-
-        # Отправляем письмо
-        try:
-            with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-                log_email_operation("Установлено SSL-соединение с smtp.gmail.com")
-
-                try:
-                    log_email_operation(f"Попытка входа с email: {GMAIL_SENDER}")
-                    server.login(GMAIL_SENDER, GMAIL_APP_PASSWORD)
-                    log_email_operation("Успешная авторизация на сервере Gmail")
-
-                    # Отправляем копию организатору
-                    log_email_operation("Отправка копии организатору...")
-                    # Создаем новое сообщение для организатора
-                    msg_copy = MIMEMultipart("alternative")
-                    msg_copy["From"] = GMAIL_SENDER
-                    msg_copy["To"] = GMAIL_SENDER
-                    msg_copy["Subject"] = f"📋 Новая встреча: {booker_email}"
-                    msg_copy.attach(MIMEText(text_body, "plain"))
-                    msg_copy.attach(MIMEText(html_body, "html"))
-                    server.send_message(msg_copy)
-                    log_email_operation("Копия организатору отправлена успешно")
-
-                    # Отправляем основное письмо участнику
-                    log_email_operation(
-                        f"Отправка письма участнику ({booker_email})..."
-                    )
-                    server.send_message(msg)
-                    log_email_operation("Письмо участнику отправлено успешно")
 
-                    success_msg = log_email_operation(
-                        "✅ Все уведомления успешно отправлены!"
-                    )
-                    st.success(success_msg)
-                    return True
+def email_slot(slot_time):
+    """Время слота из строки уведомления ("31/12/2025 13:00") для журнала"""
+    moscow_tz = pytz.timezone("Europe/Moscow")
+    return moscow_tz.localize(datetime.strptime(slot_time, "%d/%m/%Y %H:%M"))
 
-                except smtplib.SMTPAuthenticationError as auth_error:
-                    error_msg = log_email_operation(
-                        f"Ошибка аутентификации Gmail: {str(auth_error)}", "error"
-                    )
-                    st.error(error_msg)
-                    return False
 
-        except smtplib.SMTPException as smtp_error:
-            error_msg = log_email_operation(
-                f"Ошибка SMTP при отправке: {str(smtp_error)}", "error"
-            )
-            st.error(error_msg)
-            return False
+def deliver_booking_emails(job):
+    """Отправка писем задания из очереди с записью исхода в журнал"""
+    import smtplib
 
+    payload = job["payload"]
+    # Номер текущей попытки: повторы одного задания журнал считает одним случаем
+    attempt = job["attempts"] + 1
+    try:
+        send_booking_emails(
+            get_smtp_pool(GMAIL_SENDER, GMAIL_APP_PASSWORD), sent=job["sent"], **payload
+        )
     except Exception as e:
-        error_msg = log_email_operation(
-            f"Общая ошибка при отправке email: {str(e)}", "error"
+        if isinstance(e, smtplib.SMTPAuthenticationError):
+            outcome = "smtp_auth_error"
+        elif isinstance(e, smtplib.SMTPException):
+            outcome = "smtp_error"
+        elif isinstance(e, OSError):
+            outcome = "connection_error"
+        else:
+            outcome = "error"
+        booking_log.record(
+            EMAIL_SENT,
+            outcome,
+            payload["booker_email"],
+            email_slot(payload["slot_time"]),
+            job_id=job["id"],
+            attempt=attempt,
+            error=str(e),
         )
-        st.error(error_msg)
-        return False
+        # Очередь повторит отправку
+        raise
+    booking_log.record(
+        EMAIL_SENT,
+        "ok",
+        payload["booker_email"],
+        email_slot(payload["slot_time"]),
+        job_id=job["id"],
+        attempt=attempt,
+    )
 
 
 def create_calendar_event(slot_time, booker_email):
@@ -1207,70 +455,219 @@ def create_calendar_event(slot_time, booker_email):
 
     # Убеждаемся, что используем московское время
     moscow_tz = pytz.timezone("Europe/Moscow")
-    if slot_time.tzinfo != moscow_tz:
-        slot_time = slot_time.astimezone(moscow_tz)
-
-    event = {
-        "summary": f"👥 Встреча с {booker_email}",
-        "description": f"""
-Детали встречи:
-
-👤 Участник: {booker_email}
-⏱️ Продолжительность: 1 час
-📍 Место: Google Meet (ссылка будет сгенерирована автоматически)
-
-Эта встреча была забронирована через систему планирования встреч.
-Вы можете принять, отклонить или предложить другое время, используя опции выше.
-
-Нужно связаться с участником? Ответьте на это приглашение или используйте email: {booker_email}
-""",
-        "start": {
-            "dateTime": slot_time.isoformat(),
-            "timeZone": "Europe/Moscow",
-        },
-        "end": {
-            "dateTime": (slot_time + timedelta(hours=1)).isoformat(),
-            "timeZone": "Europe/Moscow",
-        },
-        "attendees": [
-            {"email": booker_email},
-            {"email": GMAIL_SENDER},
-        ],
-        "sendUpdates": "all",  # Отправляем уведомления всем участникам
-        "reminders": {
-            "useDefault": False,
-            "overrides": [
-                {"method": "email", "minutes": 60},  # Email за час до встречи
-                {
-                    "method": "popup",
-                    "minutes": 10,
-                },  # Всплывающее уведомление за 10 минут
-            ],
-        },
-        "conferenceData": {
-            "createRequest": {
-                "requestId": f"meeting_{int(datetime.now().timestamp())}",
-                "conferenceSolutionKey": {"type": "hangoutsMeet"},
-            }
-        },
-    }
+    event = build_event_body(
+        slot_time, booker_email, GMAIL_SENDER, moscow_tz, SCHEDULE.duration_delta
+    )
 
     try:
-        event = (
-            service.events()
-            .insert(
-                calendarId="primary",
-                body=event,
-                conferenceDataVersion=1,  # Добавляем поддержку Google Meet
-                sendUpdates="all",  # Отправляем уведомления всем участникам
-            )
-            .execute()
-        )
-        return True
+        with metrics.span("calendar.events_insert"):
+            created = insert_event(service, "primary", event)
     except Exception as e:
+        booking_log.record(
+            EVENT_CREATED, "error", booker_email, slot_time, error=str(e)
+        )
         st.error(f"Error creating event: {str(e)}")
         return False
 
+    # Слот занят: сбрасываем общий снимок, чтобы все сессии увидели изменение
+    availability_cache.invalidate("primary")
+    booking_log.record(
+        EVENT_CREATED, "ok", booker_email, slot_time, event_id=created.get("id")
+    )
+    return True
+
+
+def create_calendar_events_batch(slot_times, booker_email, owner):
+    """Создание нескольких событий одним пакетным запросом
+
+    Используется для массового бронирования (регулярные приемные часы,
+    групповые встречи) от имени owner. Для каждого созданного события
+    исход записывается в журнал и ставится в очередь email-уведомление, как
+    при обычном бронировании. Возвращает список результатов по слотам.
+    """
+    service = get_calendar_service()
+    moscow_tz = pytz.timezone("Europe/Moscow")
+    with metrics.span("calendar.events_batch"):
+        results = book_slots(
+            service,
+            "primary",
+            slot_times,
+            booker_email,
+            GMAIL_SENDER,
+            moscow_tz,
+            reservations,
+            owner,
+            SCHEDULE.duration_delta,
+        )
+
+    if any(result["ok"] for result in results):
+        # Слоты заняты: сбрасываем общий снимок для всех сессий
+        availability_cache.invalidate("primary")
+
+    for result in results:
+        slot_time = result["slot_time"]
+        if result["ok"]:
+            booking_log.record(
+                EVENT_CREATED,
+                "ok",
+                booker_email,
+                slot_time,
+                batch=True,
+                event_id=result["event"].get("id"),
+            )
+            send_email_notification(slot_time.strftime("%d/%m/%Y %H:%M"), booker_email)
+        else:
+            booking_log.record(
+                EVENT_CREATED,
+                "error",
+                booker_email,
+                slot_time,
+                batch=True,
+                error=result["error"],
+            )
+            log_email_operation(
+                f"Не удалось создать событие на {slot_time}: {result['error']}",
+                "error",
+            )
+    return results
+
+
+@st.fragment
+def slot_grid_section():
+    """Сетка слотов: перезапускается отдельно от страницы при смене вида"""
+    # Получение информации о слотах
+    try:
+        with metrics.span("availability.get_free_slots"):
+            availability_key, slot_grid = get_free_slots(st.session_state.show_all_days)
+    except Exception as e:
+        st.error(f"Ошибка при получении слотов: {str(e)}")
+        return
+
+    if not len(slot_grid):
+        st.warning(f"⚠️ Нет доступных слотов на ближайшие {BOOKING_WINDOW_DAYS} дн.")
+        return
+
+    # Возраст общего снимка доступности
+    snapshot_age = availability_cache.age(availability_key)
+    if snapshot_age is not None:
+        st.caption(f"🔄 Данные о занятости обновлены {int(snapshot_age)} с назад")
+
+    # Добавляем чекбокс для отображения дополнительных дней
+    st.markdown('<div class="show-more-days">', unsafe_allow_html=True)
+    st.checkbox("📅 Показать все доступные дни", key="show_all_days")
+    st.markdown("</div>", unsafe_allow_html=True)
+
+    # Создаем общий контейнер для календаря
+    st.markdown('<div class="calendar-container">', unsafe_allow_html=True)
+
+    # Отображение слотов по дням с учетом выбранного количества дней
+    # Слоты уже упорядочены по дням; времена и строки формируются только
+    # для отображаемых дней
+    day_count = slot_grid.day_count
+    if not st.session_state.show_all_days:
+        day_count = min(PREVIEW_DAYS, day_count)
+
+    # Вся сетка передается одним компонентом вместо виджета на каждый слот
+    with metrics.span("page.slot_grid"):
+        picked = slot_picker(slot_grid, day_count, key="slot_picker")
+    if picked and picked["nonce"] != st.session_state.get("slot_picker_nonce"):
+        st.session_state.slot_picker_nonce = picked["nonce"]
+        found = slot_grid.slot_at(picked["minutes"])
+        if found is None or found[1]:
+            st.warning("⚠️ Выбранное время уже недоступно, выберите другой слот")
+        else:
+            st.session_state.selected_slot = found[0]
+            st.session_state.show_booking_form = True
+            # Форма бронирования вне фрагмента, поэтому перезапускаем страницу
+            st.rerun()
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
+
+@st.fragment
+def booking_form_section():
+    """Форма бронирования выбранного слота"""
+    if "show_booking_form" in st.session_state and st.session_state.show_booking_form:
+        # Форматируем время в соответствии с настройками (31/12/2025, 13:00)
+        selected_time = st.session_state.selected_slot.strftime("%d/%m/%Y, %H:%M")
+
+        st.markdown('<div class="booking-form">', unsafe_allow_html=True)
+        st.markdown(
+            f"""
+            <div class="form-header">📝 Бронирование встречи</div>
+            <div class="form-description">
+            <b>Выбранное время:</b> {selected_time}<br>
+            <b>Продолжительность:</b> {SCHEDULE.duration_text}<br><br>
+            Для подтверждения бронирования, пожалуйста, введите ваш email-адрес.<br>
+            Вы получите:
+            <ul>
+                <li>Подтверждение бронирования</li>
+                <li>Ссылку на встречу</li>
+                <li>Напоминание за 1 час до встречи</li>
+            </ul>
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
+
+        with st.form("booking_form"):
+            booker_email = st.text_input(
+                "📧 Ваш email адрес",
+                help="На этот адрес вы получите подтверждение бронирования и детали встречи",
+                placeholder="zhenyabratkovski5@gmail.com",
+            )
+            submitted = st.form_submit_button("✅ Подтвердить бронирование")
+
+            if submitted:
+                if not booker_email:
+                    st.session_state.messages.append(
+                        ("error", "Пожалуйста, введите ваш email адрес")
+                    )
+                    st.error("Please enter your email address")
+                else:
+                    selected_slot = st.session_state.selected_slot
+                    owner = st.session_state.reservation_owner
+                    # Резервируем слот локально до обращения к Calendar API:
+                    # из одновременных бронирований к Google идет только одно
+                    if not reservations.reserve(
+                        selected_slot, selected_slot + SCHEDULE.duration_delta, owner
+                    ):
+                        st.session_state.messages.append(
+                            (
+                                "error",
+                                "Этот слот только что забронировал другой посетитель. "
+                                "Пожалуйста, выберите другое время.",
+                            )
+                        )
+                        st.error(
+                            "This slot has just been booked. Please pick another one."
+                        )
+                    elif create_calendar_event(selected_slot, booker_email):
+                        reservations.confirm(
+                            selected_slot,
+                            owner,
+                            selected_slot + SCHEDULE.duration_delta,
+                        )
+                        if send_email_notification(
+                            selected_slot.strftime("%d/%m/%Y %H:%M"),
+                            booker_email,
+                        ):
+                            st.session_state.messages.append(
+                                (
+                                    "success",
+                                    "🎉 Встреча успешно забронирована! Проверьте вашу почту.",
+                                )
+                            )
+                            st.success(
+                                "🎉 Meeting successfully booked! Check your email for details."
+                            )
+                        st.session_state.show_booking_form = False
+                        # Обновляем всю страницу: сетку слотов и сообщения
+                        st.rerun()
+                    else:
+                        reservations.release(selected_slot, owner)
+        st.markdown("</div>", unsafe_allow_html=True)
+
 
 def main():
     # Инициализация состояния для отображения дополнительных дней
@@ -1281,66 +678,9 @@ def main():
     if "messages" not in st.session_state:
         st.session_state.messages = []
 
-    # Добавляем стили для сообщений
-    st.markdown(
-        """
-        <style>
-        /* Стили для контейнера сообщений */
-        .messages-container {
-            position: fixed;
-            top: 20px;
-            right: 20px;
-            width: 300px;
-            z-index: 9999;
-            background: rgba(43, 43, 43, 0.95);
-            border-radius: 8px;
-            border: 1px solid rgba(255, 215, 0, 0.2);
-            backdrop-filter: blur(10px);
-            padding: 10px;
-            max-height: 80vh;
-            overflow-y: auto;
-        }
-
-        .message {
-            padding: 10px;
-            margin-bottom: 10px;
-            border-radius: 6px;
-            font-size: 0.9rem;
-            animation: fadeIn 0.3s ease;
-        }
-
-        .message.info {
-            background: rgba(13, 110, 253, 0.2);
-            border: 1px solid rgba(13, 110, 253, 0.3);
-            color: #8bb9fe;
-        }
-
-        .message.success {
-            background: rgba(25, 135, 84, 0.2);
-            border: 1px solid rgba(25, 135, 84, 0.3);
-            color: #75b798;
-        }
-
-        .message.error {
-            background: rgba(220, 53, 69, 0.2);
-            border: 1px solid rgba(220, 53, 69, 0.3);
-            color: #ea868f;
-        }
-
-        @keyframes fadeIn {
-            from { opacity: 0; transform: translateY(-10px); }
-            to { opacity: 1; transform: translateY(0); }
-        }
-
-        /* Увеличиваем время отображения стандартных уведомлений */
-        div[data-testid="stNotificationContent"] {
-            animation: none !important;
-            transition: opacity 0.5s ease !important;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
+    # Идентификатор сессии для резервирования слотов
+    if "reservation_owner" not in st.session_state:
+        st.session_state.reservation_owner = uuid.uuid4().hex
 
     # Отображаем контейнер с сообщениями
     if st.session_state.messages:
@@ -1350,223 +690,20 @@ def main():
         messages_html += "</div>"
         st.markdown(messages_html, unsafe_allow_html=True)
 
-    # Настраиваем стили
-    st.markdown(
-        """
-        <style>
-        /* Общие стили */
-        [data-testid="stAppViewContainer"] {
-            background: linear-gradient(135deg, #1e1e1e 0%, #2b2b2b 100%);
-            color: #e0e0e0;
-            padding: 0 !important;
-        }
-        
-        [data-testid="stVerticalBlock"] {
-            padding: 0 !important;
-            gap: 0 !important;
-        }
-        
-        /* Заголовок */
-        .header-container {
-            text-align: center;
-            padding: 2.5rem 1rem;
-            margin-bottom: 2rem;
-            background: rgba(43, 43, 43, 0.8);
-            border-radius: 16px;
-            backdrop-filter: blur(20px);
-            border: 1px solid rgba(255, 215, 0, 0.15);
-            box-shadow: 0 8px 32px rgba(0, 0, 0, 0.2);
-            transition: all 0.4s ease;
-        }
-        
-        .header-container:hover {
-            border-color: rgba(255, 215, 0, 0.3);
-            box-shadow: 0 12px 40px rgba(255, 215, 0, 0.15);
-            transform: translateY(-5px);
-        }
-        
-        .header-container h1 {
-            font-size: 2.2rem;
-            font-weight: 800;
-            margin-bottom: 0.5rem;
-            background: linear-gradient(120deg, #ffd700 0%, #ffc107 50%, #ffab00 100%);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            text-shadow: 2px 2px 4px rgba(0, 0, 0, 0.3);
-            letter-spacing: 1px;
-            line-height: 1.3;
-        }
-        
-        .subtitle {
-            font-size: 1.3rem;
-            color: #e0e0e0;
-            margin: 1rem 0;
-            letter-spacing: 2px;
-            font-weight: 500;
-            text-transform: uppercase;
-            background: linear-gradient(120deg, #ffffff 0%, #e0e0e0 100%);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            opacity: 0.9;
-            text-shadow: 1px 1px 2px rgba(0, 0, 0, 0.2);
-        }
-        
-        .form-description {
-            color: #d4d4d4;
-            line-height: 1.6;
-            font-size: 1rem;
-            margin: 1.5rem 0 0;
-            max-width: 800px;
-            margin-left: auto;
-            margin-right: auto;
-        }
-        
-        /* Статус слотов */
-        .slot-status {
-            display: flex;
-            justify-content: center;
-            gap: 2rem;
-            margin: 0.5rem 0;
-            padding: 0.5rem;
-            background: rgba(43, 43, 43, 0.7);
-            border-radius: 8px;
-            backdrop-filter: blur(10px);
-            border: 1px solid rgba(255, 215, 0, 0.1);
-            transition: all 0.3s ease;
-        }
-        
-        /* Чекбокс для отображения дополнительных дней */
-        .show-more-days {
-            background: rgba(43, 43, 43, 0.7);
-            border-radius: 8px;
-            padding: 0.5rem;
-            margin: 0.5rem 0;
-            border: 1px solid rgba(255, 215, 0, 0.1);
-            transition: all 0.3s ease;
-            text-align: center;
-        }
-        
-        /* Заголовок даты */
-        .date-header {
-            background: rgba(43, 43, 43, 0.7);
-            border-radius: 8px;
-            padding: 0.5rem;
-            margin: 0.5rem 0;
-            border: 1px solid rgba(255, 215, 0, 0.1);
-            transition: all 0.3s ease;
-        }
-        
-        .date-header h3 {
-            color: #ffd700;
-            font-size: 1rem;
-            font-weight: 600;
-            margin: 0;
-        }
-        
-        /* Кнопки слотов */
-        .stButton button {
-            width: 100%;
-            padding: 0.5rem;
-            border-radius: 6px;
-            font-size: 0.9rem;
-            font-weight: 500;
-            transition: all 0.3s ease;
-            background: rgba(255, 215, 0, 0.1);
-            color: #ffd700;
-            border: 1px solid rgba(255, 215, 0, 0.2);
-            margin: 0 !important;
-        }
-        
-        /* Форма бронирования */
-        .booking-form {
-            background: rgba(43, 43, 43, 0.7);
-            border-radius: 8px;
-            padding: 1rem;
-            margin: 0.5rem 0;
-            border: 1px solid rgba(255, 215, 0, 0.1);
-            backdrop-filter: blur(10px);
-        }
-        
-        .form-header {
-            font-size: 1.2rem;
-            font-weight: 600;
-            color: #ffd700;
-            margin-bottom: 0.5rem;
-        }
-        
-        /* Стилизация колонок Streamlit */
-        [data-testid="stHorizontalBlock"] {
-            gap: 0.25rem !important;
-            padding: 0 !important;
-        }
-        
-        /* Убираем отступы у элементов формы */
-        .stTextInput {
-            margin: 0 !important;
-        }
-        
-        .stTextInput > div {
-            margin: 0 !important;
-        }
-        
-        .stForm > div {
-            margin-bottom: 0 !important;
-        }
-        
-        .stForm [data-testid="stFormSubmitButton"] {
-            margin: 0 !important;
-        }
-        
-        /* Убираем отступы у чекбокса */
-        .stCheckbox {
-            margin: 0 !important;
-        }
-        
-        .stCheckbox > div {
-            margin: 0 !important;
-        }
-        
-        /* Убираем отступы у алертов */
-        .stAlert {
-            margin: 0.5rem 0 !important;
-            padding: 0.5rem !important;
-        }
-        
-        /* Убираем отступы у markdown */
-        .stMarkdown {
-            margin: 0 !important;
-        }
-        
-        .stMarkdown > div {
-            margin: 0 !important;
-        }
-        
-        /* Календарь */
-        .calendar-container {
-            padding: 0.5rem;
-            margin: 0;
-            background: rgba(43, 43, 43, 0.7);
-            border-radius: 8px;
-            border: 1px solid rgba(255, 215, 0, 0.1);
-        }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
-
     # Добавляем заголовок
     st.markdown(
-        """
+        f"""
         <div class="header-container">
             <h1>СВОБОДНЫЕ СЛОТЫ</h1>
             <div class="subtitle">БРАТКОВСКИЙ<br class="mobile-break"> ЕВГЕНИЙ<br class="mobile-break"> ВИКТОРОВИЧ</div>
             <div class="form-description">
-                Выберите удобное время для встречи. Продолжительность встречи - 1 час.<br>
-                Рабочие часы: с 9:00 до 18:00 (последняя встреча в 17:00)<br>
+                Выберите удобное время для встречи. Продолжительность встречи - {SCHEDULE.duration_text}.<br>
+                {SCHEDULE.hours_text()}<br>
                 После выбора времени вам нужно будет ввести email для получения подтверждения.
             </div>
         </div>
-
+        """
+        + """
         <!-- Скрипт для автоматического обновления страницы -->
         <script>
             function getMillisecondsUntilMidnight() {
@@ -1613,30 +750,6 @@ def main():
                 updateNextRefreshTime();
             });
         </script>
-
-        <style>
-        /* Добавляем стили для индикатора обновления */
-        .refresh-info {
-            font-size: 0.9rem;
-            color: #888;
-            margin-top: 1rem;
-            text-align: center;
-            font-style: italic;
-            opacity: 0.8;
-            transition: opacity 0.3s ease;
-        }
-
-        .refresh-info:hover {
-            opacity: 1;
-        }
-
-        @media screen and (max-width: 768px) {
-            .refresh-info {
-                font-size: 0.8rem;
-                margin-top: 0.8rem;
-            }
-        }
-        </style>
         """,
         unsafe_allow_html=True,
     )
@@ -1663,132 +776,59 @@ def main():
         st.error("Необходимо настроить OAuth. Пожалуйста, свяжитесь с администратором.")
         st.stop()
 
-    # Получение информации о слотах
-    try:
-        slots_info = get_free_slots()
-    except Exception as e:
-        st.error(f"Ошибка при получении слотов: {str(e)}")
-        return
-
-    if not slots_info:
-        st.warning("⚠️ Нет доступных слотов на ближайшие 2 недели")
-        return
-
-    # Группировка слотов по дням
-    slots_by_day = {}
-    for slot, info in slots_info.items():
-        day = info["date"]
-        if day not in slots_by_day:
-            slots_by_day[day] = []
-        slots_by_day[day].append((slot, info))
-
-    # Добавляем чекбокс для отображения дополнительных дней
-    st.markdown('<div class="show-more-days">', unsafe_allow_html=True)
-    st.checkbox("📅 Показать все доступные дни", key="show_all_days")
-    st.markdown("</div>", unsafe_allow_html=True)
-
-    # Создаем общий контейнер для календаря
-    st.markdown('<div class="calendar-container">', unsafe_allow_html=True)
-
-    # Отображение слотов по дням с учетом выбранного количества дней
-    sorted_days = sorted(slots_by_day.keys())
-    days_to_show = sorted_days if st.session_state.show_all_days else sorted_days[:3]
-
-    for day in days_to_show:
-        slots = slots_by_day[day]
-        date_obj = datetime.strptime(day, "%Y-%m-%d")
-        formatted_date = date_obj.strftime("%d/%m/%Y")
-        weekday = date_obj.strftime("%A")
-
-        st.markdown(
-            f"""
-            <div class="date-header">
-                <h3>{formatted_date} · {weekday}</h3>
-            </div>
-        """,
-            unsafe_allow_html=True,
+    # Запускаем фоновое обновление снимка доступности (один поток на процесс)
+    if AVAILABILITY_REFRESH_INTERVAL:
+        credentials = {
+            "client_id": st.secrets["google_client_id"],
+            "client_secret": st.secrets["google_client_secret"],
+            "refresh_token": st.secrets["google_refresh_token"],
+            "token_uri": st.secrets["token_uri"],
+        }
+        availability_refresher.start(
+            get_availability_key,
+            lambda: refresh_free_slots(credentials),
+            AVAILABILITY_REFRESH_INTERVAL,
         )
 
-        # Создаем сетку для временных слотов (6 колонок)
-        cols = st.columns(6)
-        for i, (slot, info) in enumerate(slots):
-            with cols[i % 6]:
-                if info["is_busy"]:
-                    st.markdown(
-                        f'<button class="unavailable" disabled>{info["time"]}</button>',
-                        unsafe_allow_html=True,
-                    )
-                else:
-                    if st.button(
-                        info["time"],
-                        key=f"slot_{slot.isoformat()}",
-                        use_container_width=True,
-                        type="secondary",
-                    ):
-                        st.session_state.selected_slot = slot
-                        st.session_state.show_booking_form = True
-
-    st.markdown("</div>", unsafe_allow_html=True)
-
-    # Форма бронирования
-    if "show_booking_form" in st.session_state and st.session_state.show_booking_form:
-        # Форматируем время в соответствии с настройками (31/12/2025, 13:00)
-        selected_time = st.session_state.selected_slot.strftime("%d/%m/%Y, %H:%M")
-
-        st.markdown('<div class="booking-form">', unsafe_allow_html=True)
-        st.markdown(
-            f"""
-            <div class="form-header">📝 Бронирование встречи</div>
-            <div class="form-description">
-            <b>Выбранное время:</b> {selected_time}<br>
-            <b>Продолжительность:</b> 1 час<br><br>
-            Для подтверждения бронирования, пожалуйста, введите ваш email-адрес.<br>
-            Вы получите:
-            <ul>
-                <li>Подтверждение бронирования</li>
-                <li>Ссылку на встречу</li>
-                <li>Напоминание за 1 час до встречи</li>
-            </ul>
-            </div>
-            """,
-            unsafe_allow_html=True,
+    # Запускаем фоновую доставку писем (досылает и задания с прошлого запуска)
+    email_outbox.start(deliver_booking_emails)
+
+    # Сетка слотов и форма бронирования перезапускаются независимо друг от
+    # друга и от остальной страницы
+    slot_grid_section()
+    booking_form_section()
+
+    # Состояние фонового обновления и эффективность кэша
+    refresher_state = availability_refresher.diagnostics()
+    if refresher_state["running"]:
+        last_success = refresher_state["last_success"]
+        st.sidebar.caption(
+            f"Фоновое обновление: каждые {refresher_state['interval']} с, "
+            "последнее успешное: "
+            + (last_success.strftime("%H:%M:%S") if last_success else "еще не было")
         )
+        if refresher_state["last_error"]:
+            st.sidebar.caption(f"Ошибка обновления: {refresher_state['last_error']}")
+    cache_stats = availability_cache.stats()
+    st.sidebar.caption(
+        f"Кэш доступности: {cache_stats['hit_rate']:.0%} попаданий "
+        f"({cache_stats['hits']} из {cache_stats['hits'] + cache_stats['misses']})"
+    )
 
-        with st.form("booking_form"):
-            booker_email = st.text_input(
-                "📧 Ваш email адрес",
-                help="На этот адрес вы получите подтверждение бронирования и детали встречи",
-                placeholder="zhenyabratkovski5@gmail.com",
+    # Панель задержек по этапам (только при включенных замерах)
+    if metrics.enabled:
+        with st.sidebar.expander("⏱️ Задержки этапов"):
+            rows = [
+                f"| {row['stage']} | {row['count']} | {row['mean_ms']:.1f} "
+                f"| {row['p50_ms']:g} | {row['p95_ms']:g} |"
+                for row in metrics.summary()
+            ]
+            st.markdown(
+                "| Этап | N | Среднее, мс | p50 ≤ мс | p95 ≤ мс |\n"
+                "|---|---|---|---|---|\n" + "\n".join(rows)
             )
-            submitted = st.form_submit_button("✅ Подтвердить бронирование")
-
-            if submitted:
-                if not booker_email:
-                    st.session_state.messages.append(
-                        ("error", "Пожалуйста, введите ваш email адрес")
-                    )
-                    st.error("Please enter your email address")
-                else:
-                    if create_calendar_event(
-                        st.session_state.selected_slot, booker_email
-                    ):
-                        if send_email_notification(
-                            st.session_state.selected_slot.strftime("%d/%m/%Y %H:%M"),
-                            booker_email,
-                        ):
-                            st.session_state.messages.append(
-                                (
-                                    "success",
-                                    "🎉 Встреча успешно забронирована! Проверьте вашу почту.",
-                                )
-                            )
-                            st.success(
-                                "🎉 Meeting successfully booked! Check your email for details."
-                            )
-                        st.session_state.show_booking_form = False
-                        st.rerun()
-        st.markdown("</div>", unsafe_allow_html=True)
 
 
 if __name__ == "__main__":
-    main()
+    with metrics.span("page.main"):
+        main()
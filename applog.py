@@ -0,0 +1,117 @@
+"""Неблокирующая запись логов в файл с ротацией и сжатием старых файлов"""
+
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+# Размер блока при чтении лога с конца
+_BLOCK_SIZE = 64 * 1024
+
+_lock = threading.Lock()
+_listener = None
+
+
+def _gzip_namer(name):
+    return name + ".gz"
+
+
+def _gzip_rotator(source, dest):
+    # Выполняется в потоке QueueListener, поток запроса не ждет сжатия
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def file_handler(log_file, max_bytes=5 * 1024 * 1024, backups=10, when=None):
+    """Обработчик файла с ротацией по размеру или, если указан when
+    ("midnight", "H", ...), по времени; старые файлы сжимаются в .gz"""
+    if when:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            log_file, when=when, backupCount=backups, encoding="utf-8"
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+        )
+    handler.namer = _gzip_namer
+    handler.rotator = _gzip_rotator
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+
+def setup_logging(log_file, level=logging.INFO, **rotation):
+    """Направляет корневой логгер в файл через очередь (один раз на процесс)
+
+    Вызов logging.info() только кладет запись в очередь. Запись на диск,
+    ротацию и сжатие выполняет фоновый поток QueueListener. rotation —
+    параметры file_handler: max_bytes, backups, when.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        records = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(
+            records, file_handler(log_file, **rotation), respect_handler_level=True
+        )
+        root = logging.getLogger()
+        root.addHandler(logging.handlers.QueueHandler(records))
+        root.setLevel(level)
+        listener.start()
+        # Дописываем оставшиеся в очереди записи при завершении процесса
+        atexit.register(listener.stop)
+        _listener = listener
+        return listener
+
+
+def read_log_tail(log_file, limit=100, before=None, level=None, contains=None):
+    """Возвращает до limit последних строк лога, подходящих под фильтры
+
+    Файл читается блоками с конца, начиная с байтового смещения before (или
+    с конца файла), поэтому в памяти не оказывается весь файл. level —
+    уровень записи ("ERROR", ...), contains — подстрока (например, email).
+    Возвращает (строки в порядке файла, смещение для следующей страницы или
+    None, если достигнуто начало файла).
+    """
+    marker = f" - {level} - " if level else None
+    matched = []
+    with open(log_file, "rb") as f:
+        position = f.seek(0, os.SEEK_END) if before is None else before
+        # Непросмотренные байты [position, position + len(pending))
+        pending = b""
+        while True:
+            newline = pending.rfind(b"\n")
+            if newline == -1 and position > 0:
+                size = min(_BLOCK_SIZE, position)
+                position -= size
+                f.seek(position)
+                pending = f.read(size) + pending
+                continue
+
+            # Последняя полная строка и смещение ее начала в файле
+            line_start = position + newline + 1
+            line = pending[newline + 1 :].decode("utf-8", errors="replace")
+            pending = pending[: max(newline, 0)]
+            if line and _matches(line, marker, contains):
+                matched.append(line)
+                if len(matched) == limit:
+                    break
+            if line_start == 0:
+                break
+
+    matched.reverse()
+    return matched, line_start or None
+
+
+def _matches(line, marker, contains):
+    if marker is not None and marker not in line:
+        return False
+    return contains is None or contains in line
@@ -0,0 +1,331 @@
+"""Расчёт занятости слотов по интервалам событий календаря"""
+
+from datetime import datetime, time, timedelta
+
+import numpy as np
+
+_MINUTE = timedelta(minutes=1)
+
+
+def event_interval(event, tz):
+    """Возвращает (начало, конец) события в часовом поясе tz или None,
+    если участие в событии отклонено"""
+    # Пропускаем события, где вы не подтвердили участие
+    response_status = next(
+        (
+            attendee["responseStatus"]
+            for attendee in event.get("attendees", [])
+            if attendee.get("self", False)
+        ),
+        event.get("status", "confirmed"),  # Для событий, где вы организатор
+    )
+    if response_status == "declined":
+        return None
+
+    return (
+        _parse_event_time(event["start"], tz),
+        _parse_event_time(event["end"], tz),
+    )
+
+
+def _parse_event_time(value, tz):
+    """Разбирает поле start/end события (dateTime или date для событий на весь день)"""
+    parsed = datetime.fromisoformat(value.get("dateTime", value.get("date")))
+    if parsed.tzinfo is None:
+        # События на весь день приходят без часового пояса
+        return tz.localize(parsed)
+    return parsed.astimezone(tz)
+
+
+class BusyIntervals:
+    """Отсортированный набор непересекающихся занятых интервалов
+
+    Интервалы объединяются один раз при построении и передаются в расчет
+    сетки массивами (to_datetime64).
+    """
+
+    def __init__(self, intervals=()):
+        merged = []
+        for start, end in sorted(intervals):
+            if end <= start:
+                continue
+            if merged and start <= merged[-1][1]:
+                # Интервал примыкает к предыдущему или пересекается с ним
+                if end > merged[-1][1]:
+                    merged[-1][1] = end
+            else:
+                merged.append([start, end])
+
+        self.starts = [start for start, _ in merged]
+        self.ends = [end for _, end in merged]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def to_datetime64(self):
+        """Возвращает начала и концы интервалов массивами datetime64[m] (UTC)
+
+        Начало округляется вниз, конец вверх до минуты, чтобы занятое время
+        не сокращалось.
+        """
+        starts = np.array(
+            [int(start.timestamp() // 60) for start in self.starts], dtype=np.int64
+        )
+        ends = np.array(
+            [-int(-end.timestamp() // 60) for end in self.ends], dtype=np.int64
+        )
+        return starts.astype("datetime64[m]"), ends.astype("datetime64[m]")
+
+
+class SlotGrid:
+    """Компактная сетка слотов окна бронирования
+
+    Начала слотов хранятся одним массивом минут от эпохи (int32, UTC),
+    занятость — битовой маской (один бит на слот). Слоты одного дня идут
+    подряд: day_bounds[i]:day_bounds[i + 1] — срез дня days[i]. Объекты
+    datetime создаются только при обходе отображаемых дней.
+    """
+
+    __slots__ = ("days", "day_bounds", "minutes", "busy_bits", "tz", "_size")
+
+    def __init__(self, days, day_bounds, starts, busy, tz):
+        self.days = days
+        self.day_bounds = day_bounds
+        self.minutes = starts.astype(np.int64).astype(np.int32)
+        self.busy_bits = np.packbits(busy)
+        self.tz = tz
+        self._size = len(starts)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def day_count(self):
+        return len(self.days)
+
+    def is_busy(self, index):
+        """Признак занятости слота с номером index"""
+        return bool((self.busy_bits[index >> 3] >> (7 - (index & 7))) & 1)
+
+    def busy_mask(self):
+        """Распаковывает маску занятости в массив bool"""
+        return np.unpackbits(self.busy_bits, count=self._size).astype(bool)
+
+    def day(self, index):
+        """Возвращает представление слотов дня с номером index"""
+        return DaySlots(self, index)
+
+    def slot_at(self, minutes):
+        """Возвращает (начало слота, занят ли слот) по минутам от эпохи или None"""
+        index = int(np.searchsorted(self.minutes, minutes))
+        if index == self._size or self.minutes[index] != minutes:
+            return None
+        start = datetime.fromtimestamp(int(minutes) * 60, self.tz)
+        return start, self.is_busy(index)
+
+
+class DaySlots:
+    """Представление слотов одного дня сетки без копирования данных"""
+
+    __slots__ = ("grid", "date", "begin", "end")
+
+    def __init__(self, grid, index):
+        self.grid = grid
+        self.date = grid.days[index].astype(object)
+        self.begin = int(grid.day_bounds[index])
+        self.end = int(grid.day_bounds[index + 1])
+
+    def __len__(self):
+        return self.end - self.begin
+
+    def __iter__(self):
+        """Перебирает пары (начало слота в часовом поясе сетки, занят ли слот)"""
+        grid = self.grid
+        for index in range(self.begin, self.end):
+            start = datetime.fromtimestamp(int(grid.minutes[index]) * 60, grid.tz)
+            yield start, grid.is_busy(index)
+
+
+# Ключи дней недели в настройках расписания, начиная с понедельника
+WEEKDAY_KEYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+WEEKDAY_NAMES = dict(zip(WEEKDAY_KEYS, ("пн", "вт", "ср", "чт", "пт", "сб", "вс")))
+
+
+class Schedule:
+    """Настройки расписания встреч и предрассчитанный недельный шаблон слотов
+
+    duration — длительность встречи, step — шаг сетки, buffer — минимальный
+    зазор между встречей и соседними событиями (все в минутах). hours —
+    рабочие часы по дням недели: {"mon": ("09:00", "18:00"), ...}; встреча
+    должна закончиться не позже конца рабочего дня. holidays — нерабочие даты,
+    window_days — длина окна бронирования в днях.
+
+    Смещения начала слотов от полуночи для каждого дня недели считаются один
+    раз при создании расписания и затем накладываются на даты окна.
+    """
+
+    def __init__(
+        self,
+        duration=60,
+        step=60,
+        buffer=0,
+        hours=None,
+        holidays=(),
+        window_days=14,
+    ):
+        if hours is None:
+            hours = {key: ("09:00", "18:00") for key in WEEKDAY_KEYS[:5]}
+
+        self.duration = duration
+        self.step = step
+        self.buffer = buffer
+        self.window_days = window_days
+        self.hours = {key: tuple(hours[key]) for key in WEEKDAY_KEYS if key in hours}
+        self.holidays = np.array(sorted(holidays), dtype="datetime64[D]")
+
+        # Недельный шаблон: строка на день недели, лишние ячейки помечены маской
+        offsets = []
+        for key in WEEKDAY_KEYS:
+            if key in self.hours:
+                opens, closes = (_parse_minutes(value) for value in self.hours[key])
+                offsets.append(np.arange(opens, closes - duration + 1, step))
+            else:
+                offsets.append(np.arange(0))
+        width = max(len(day_offsets) for day_offsets in offsets)
+        self.template = np.zeros((7, width), dtype="timedelta64[m]")
+        self.template_mask = np.zeros((7, width), dtype=bool)
+        for weekday, day_offsets in enumerate(offsets):
+            self.template[weekday, : len(day_offsets)] = day_offsets
+            self.template_mask[weekday, : len(day_offsets)] = True
+
+    @classmethod
+    def from_config(cls, config):
+        """Создает расписание из словаря настроек (например, секции secrets)"""
+        return cls(
+            duration=int(config.get("duration", 60)),
+            step=int(config.get("step", 60)),
+            buffer=int(config.get("buffer", 0)),
+            hours=dict(config["hours"]) if "hours" in config else None,
+            holidays=list(config.get("holidays", ())),
+            window_days=int(config.get("window_days", 14)),
+        )
+
+    @property
+    def duration_delta(self):
+        return timedelta(minutes=self.duration)
+
+    @property
+    def duration_text(self):
+        """Длительность встречи по-русски: «1 час», «45 минут», «1 ч 30 мин»"""
+        return format_duration(self.duration)
+
+    def hours_text(self):
+        """Описание рабочих часов для страницы бронирования"""
+        if len(set(self.hours.values())) == 1:
+            opens, closes = next(iter(self.hours.values()))
+            weekday = WEEKDAY_KEYS.index(next(iter(self.hours)))
+            text = (
+                f"Рабочие часы: с {_format_minutes(_parse_minutes(opens))} "
+                f"до {_format_minutes(_parse_minutes(closes))}"
+            )
+            day_offsets = self.template[weekday][self.template_mask[weekday]]
+            if len(day_offsets):
+                last_start = int(day_offsets.max().astype(int))
+                text += f" (последняя встреча в {_format_minutes(last_start)})"
+            return text
+        return "Рабочие часы: " + ", ".join(
+            f"{WEEKDAY_NAMES[key]} {_format_minutes(_parse_minutes(opens))}"
+            f"–{_format_minutes(_parse_minutes(closes))}"
+            for key, (opens, closes) in self.hours.items()
+        )
+
+    def span_days(self, start_date, work_days):
+        """Сколько календарных дней от start_date покрывают первые work_days
+        рабочих дней (не больше окна бронирования)"""
+        first_day = np.datetime64(start_date, "D")
+        all_days = np.arange(first_day, first_day + self.window_days)
+        weekdays = (all_days.astype(np.int64) + 3) % 7
+        is_working = self.template_mask[weekdays].any(axis=1)
+        is_working &= ~np.isin(all_days, self.holidays)
+        positions = np.flatnonzero(is_working)
+        if len(positions) <= work_days:
+            return self.window_days
+        return int(positions[work_days - 1]) + 1
+
+
+def format_duration(minutes):
+    """Форматирует длительность в минутах: «1 час», «45 минут», «1 ч 30 мин»"""
+    hours, minutes = divmod(minutes, 60)
+    if hours and minutes:
+        return f"{hours} ч {minutes} мин"
+    if hours:
+        return f"{hours} {_plural(hours, 'час', 'часа', 'часов')}"
+    return f"{minutes} {_plural(minutes, 'минута', 'минуты', 'минут')}"
+
+
+def _plural(number, one, few, many):
+    if number % 10 == 1 and number % 100 != 11:
+        return one
+    if 2 <= number % 10 <= 4 and not 12 <= number % 100 <= 14:
+        return few
+    return many
+
+
+def _format_minutes(minutes):
+    return f"{minutes // 60}:{minutes % 60:02d}"
+
+
+def _parse_minutes(value):
+    """Переводит строку "ЧЧ:ММ" в минуты от полуночи"""
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def build_slot_grid(start_date, days, tz, busy, schedule):
+    """Строит сетку слотов на days дней начиная с start_date по расписанию
+
+    Недельный шаблон расписания накладывается на даты окна без циклов по
+    слотам. Занятость считается бинарным поиском по объединенным интервалам
+    busy с учетом буфера между встречами.
+    """
+    first_day = np.datetime64(start_date.date(), "D")
+    all_days = np.arange(first_day, first_day + days)
+    all_days = all_days[~np.isin(all_days, schedule.holidays)]
+
+    # 1970-01-01 — четверг, поэтому день недели (пн = 0) — это (дни + 3) % 7
+    weekdays = (all_days.astype(np.int64) + 3) % 7
+    counts = schedule.template_mask[weekdays].sum(axis=1)
+    work_days = all_days[counts > 0]
+    weekdays = weekdays[counts > 0]
+    counts = counts[counts > 0]
+
+    # Смещение часового пояса для каждого дня (учитывает переход на летнее время)
+    utc_offsets = np.array(
+        [
+            tz.utcoffset(datetime.combine(day, time(12))) // _MINUTE
+            for day in work_days.astype(object)
+        ],
+        dtype="timedelta64[m]",
+    ).reshape(-1, 1)
+
+    day_starts = work_days.astype("datetime64[m]").reshape(-1, 1) - utc_offsets
+    starts = (day_starts + schedule.template[weekdays])[
+        schedule.template_mask[weekdays]
+    ]
+    day_bounds = np.concatenate(([0], np.cumsum(counts)))
+
+    # Последний занятый интервал, начавшийся до конца слота (с буфером),
+    # пересекается со слотом, если заканчивается после его начала (с буфером)
+    busy_starts, busy_ends = busy.to_datetime64()
+    buffer = np.timedelta64(schedule.buffer, "m")
+    slot_starts = starts - buffer
+    slot_ends = starts + np.timedelta64(schedule.duration, "m") + buffer
+    index = np.searchsorted(busy_starts, slot_ends, side="left") - 1
+    is_busy = np.zeros(len(starts), dtype=bool)
+    if len(busy_starts):
+        is_busy = (index >= 0) & (busy_ends[np.maximum(index, 0)] > slot_starts)
+
+    return SlotGrid(work_days, day_bounds, starts, is_busy, tz)
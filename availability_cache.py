@@ -0,0 +1,243 @@
+"""Общий для всех сессий кэш снимков доступности слотов и фоновое обновление"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+
+class AvailabilityCache:
+    """Кэш рассчитанной доступности с коротким TTL
+
+    Ключ — (id календаря, начало окна, длина окна в днях). Доступность
+    одинакова для всех посетителей, поэтому снимок рассчитывается один раз
+    на ключ и период TTL. Пока один поток считает снимок, остальные ждут его
+    результата, а не обращаются к Google параллельно.
+
+    invalidate() увеличивает поколение календаря. Расчет, начатый до сброса
+    (например, в фоновом потоке во время бронирования), не кладет в кэш
+    снимок без нового события.
+
+    Снимок нового окна вытесняет снимки и блокировки того же календаря с
+    более ранним началом окна, чтобы кэш не рос день ото дня.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # ключ -> (время расчета по time.monotonic, снимок)
+        self._key_locks = {}
+        self._prefetches = {}
+        self._generations = {}  # id календаря -> номер поколения
+        self._epoch = 0  # увеличивается при сбросе всех календарей
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, compute, ttl):
+        """Возвращает снимок из кэша или рассчитывает его через compute()"""
+        entry = self._fresh_entry(key, ttl)
+        if entry is not None:
+            self._count(hit=True)
+            return entry[1]
+
+        with self._lock_for(key):
+            # Пока ждали блокировку, снимок мог рассчитать другой поток
+            entry = self._fresh_entry(key, ttl)
+            if entry is not None:
+                self._count(hit=True)
+                return entry[1]
+
+            self._count(hit=False)
+            generation = self.generation(key[0])
+            value = compute()
+            self.put(key, value, generation)
+            return value
+
+    def peek(self, key, ttl=None):
+        """Возвращает снимок без расчета или None
+
+        Если ttl не указан, снимок возвращается независимо от возраста.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or ttl is not None and time.monotonic() - entry[0] >= ttl:
+            return None
+        self._count(hit=True)
+        return entry[1]
+
+    def prefetch(self, key, compute, ttl):
+        """Рассчитывает снимок в фоновом потоке, если его нет в кэше
+
+        Повторные вызовы, пока расчет по ключу идет, ничего не делают.
+        compute() не должна обращаться к элементам интерфейса Streamlit.
+        """
+        if self._fresh_entry(key, ttl) is not None:
+            return
+        with self._lock:
+            thread = self._prefetches.get(key)
+            if thread is not None and thread.is_alive():
+                return
+            thread = threading.Thread(
+                target=self._prefetch, args=(key, compute, ttl), daemon=True
+            )
+            self._prefetches[key] = thread
+        thread.start()
+
+    def generation(self, calendar_id):
+        """Текущее поколение календаря; берется до начала расчета снимка"""
+        with self._lock:
+            return self._epoch, self._generations.get(calendar_id, 0)
+
+    def put(self, key, value, generation=None):
+        """Атомарно заменяет снимок по ключу
+
+        Если передано поколение, полученное до расчета, и с тех пор календарь
+        сбрасывали, снимок устарел и не сохраняется. Возвращает, сохранен ли
+        снимок.
+        """
+        with self._lock:
+            current = (self._epoch, self._generations.get(key[0], 0))
+            if generation is not None and generation != current:
+                return False
+            self._entries[key] = (time.monotonic(), value)
+            self._evict_before(key)
+            return True
+
+    def invalidate(self, calendar_id=None):
+        """Удаляет снимки календаря (или все снимки, если id не указан)"""
+        with self._lock:
+            if calendar_id is None:
+                self._epoch += 1
+            else:
+                self._generations[calendar_id] = (
+                    self._generations.get(calendar_id, 0) + 1
+                )
+            for key in list(self._entries):
+                if calendar_id is None or key[0] == calendar_id:
+                    del self._entries[key]
+
+    def age(self, key):
+        """Возвращает возраст снимка в секундах или None, если его нет"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return time.monotonic() - entry[0]
+
+    def stats(self):
+        """Возвращает счетчики попаданий и промахов кэша"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+            }
+
+    def _fresh_entry(self, key, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] >= ttl:
+            return None
+        return entry
+
+    def _prefetch(self, key, compute, ttl):
+        try:
+            self.get_or_compute(key, compute, ttl)
+        except Exception as e:
+            logging.error(f"Ошибка фоновой загрузки доступности: {str(e)}")
+        finally:
+            with self._lock:
+                self._prefetches.pop(key, None)
+
+    def _evict_before(self, key):
+        # Вызывается под self._lock: окна, начавшиеся раньше key, больше не
+        # запрашиваются
+        calendar_id, start = key[0], key[1]
+        for stored in (self._entries, self._key_locks):
+            for old_key in list(stored):
+                if old_key[0] == calendar_id and old_key[1] < start:
+                    del stored[old_key]
+
+    def _lock_for(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+class AvailabilityRefresher:
+    """Фоновый поток, периодически пересчитывающий снимок доступности
+
+    Поток запускается один раз на процесс и кладет свежий снимок в кэш,
+    поэтому страница читает готовые данные и не ждет ответа Google.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.interval = None
+        self.last_success = None
+        self.last_error = None
+        self._key_fn = None
+        self._compute = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, key_fn, compute, interval):
+        """Запускает поток, если он еще не запущен, и обновляет его настройки
+
+        key_fn() возвращает ключ текущего окна, compute() рассчитывает снимок.
+        Обе функции вызываются из фонового потока и не должны обращаться к
+        элементам интерфейса Streamlit.
+        """
+        with self._lock:
+            self._key_fn = key_fn
+            self._compute = compute
+            self.interval = interval
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="availability-refresher", daemon=True
+                )
+                self._thread.start()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def diagnostics(self):
+        """Возвращает интервал, время последнего успешного обновления и ошибку"""
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "last_success": self.last_success,
+            "last_error": self.last_error,
+        }
+
+    def _run(self):
+        while True:
+            with self._lock:
+                key_fn, compute, interval = self._key_fn, self._compute, self.interval
+            try:
+                key = key_fn()
+                generation = self.cache.generation(key[0])
+                if not self.cache.put(key, compute(), generation):
+                    # Во время расчета календарь сбросили: считаем заново сразу
+                    logging.info("Снимок доступности устарел до сохранения")
+                    continue
+                self.last_success = datetime.now()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logging.error(f"Ошибка фонового обновления доступности: {str(e)}")
+            time.sleep(interval)
+
+
+# Модули сохраняются между перезапусками скрипта Streamlit, поэтому
+# кэш и поток обновления общие для всех сессий процесса
+availability_cache = AvailabilityCache()
+availability_refresher = AvailabilityRefresher(availability_cache)
@@ -0,0 +1,250 @@
+"""Локальные заменители внешних сервисов для бенчмарков"""
+
+import json
+import random
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from availability import event_interval
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Минимальный SMTP-диалог: принимает любые письма и сохраняет их"""
+
+    def handle(self):
+        # Задержка приветствия и входа имитирует TLS-рукопожатие и авторизацию
+        time.sleep(self.server.latency)
+        self._reply("220 localhost fake SMTP sink")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode("utf-8", "replace").strip().split(" ")[0].upper()
+
+            if verb == "EHLO":
+                self.wfile.write(
+                    b"250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n"
+                )
+            elif verb == "AUTH":
+                time.sleep(self.server.latency)
+                self._reply("235 2.7.0 Authentication successful")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                self._receive_message()
+                self._reply("250 OK: queued")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                # HELO, MAIL, RCPT, RSET, NOOP
+                self._reply("250 OK")
+
+    def _receive_message(self):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line == b".\r\n":
+                break
+            lines.append(line)
+        with self.server.lock:
+            self.server.messages.append(b"".join(lines))
+
+    def _reply(self, text):
+        self.wfile.write(text.encode("utf-8") + b"\r\n")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """SMTP-сервер на localhost, который принимает письма без доставки
+
+    latency — задержка в секундах на приветствие и вход, чтобы стоимость
+    нового подключения была сопоставима с реальным сервером.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        super().__init__((host, port), _SMTPHandler)
+        self.latency = latency
+        self.messages = []
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class _Request:
+    """Отложенный запрос в стиле googleapiclient: выполняется в execute()"""
+
+    def __init__(self, service, respond):
+        self.service = service
+        self.respond = respond
+
+    def execute(self):
+        # Задержка имитирует сетевой обмен с Google
+        time.sleep(self.service.latency)
+        return self.respond()
+
+
+class _Events:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, calendarId, pageToken=None, maxResults=250, syncToken=None, **_):
+        service = self.service
+
+        def respond():
+            with service.lock:
+                service.list_calls += 1
+            if syncToken is not None:
+                # Изменений с прошлой синхронизации нет
+                return {"items": [], "nextSyncToken": syncToken}
+            start = int(pageToken or 0)
+            response = {"items": service.recorded[start : start + maxResults]}
+            if start + maxResults < len(service.recorded):
+                response["nextPageToken"] = str(start + maxResults)
+            else:
+                response["nextSyncToken"] = f"sync-{len(service.recorded)}"
+            return response
+
+        return _Request(service, respond)
+
+    def insert(self, calendarId, body, **_):
+        service = self.service
+
+        def respond():
+            with service.lock:
+                service.inserted.append(body)
+                return {"id": f"created-{len(service.inserted)}", **body}
+
+        return _Request(service, respond)
+
+
+class _FreeBusy:
+    def __init__(self, service):
+        self.service = service
+
+    def query(self, body):
+        service = self.service
+
+        def respond():
+            tz = pytz.timezone(body.get("timeZone", "UTC"))
+            time_min = datetime.fromisoformat(body["timeMin"])
+            time_max = datetime.fromisoformat(body["timeMax"])
+            # Поля start/end разбираются как в расчете занятости: dateTime
+            # или date для событий на весь день; отклоненные пропускаются
+            intervals = (
+                event_interval(event, tz)
+                for event in service.recorded
+                if event.get("status") != "cancelled"
+            )
+            busy = [
+                {"start": start.isoformat(), "end": end.isoformat()}
+                for start, end in (
+                    interval for interval in intervals if interval is not None
+                )
+                if end > time_min and start < time_max
+            ]
+            return {"calendars": {item["id"]: {"busy": busy} for item in body["items"]}}
+
+        return _Request(service, respond)
+
+
+class _Batch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        # Один сетевой обмен на весь пакет
+        time.sleep(self.service.latency)
+        for request_id, request in self.requests:
+            self.callback(request_id, request.respond(), None)
+
+
+class FakeCalendarService:
+    """Заменитель сервиса Calendar API v3 для events(), freebusy() и пакетов
+
+    events().list отдает заранее подготовленные события страницами по
+    maxResults, как Google при полной синхронизации; запрос с syncToken
+    возвращает пустой список изменений. latency — задержка на запрос.
+    """
+
+    def __init__(self, events, latency=0.0):
+        self.recorded = list(events)
+        self.latency = latency
+        self.inserted = []
+        self.list_calls = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, latency=0.0):
+        """Загружает записанные ответы events().list (JSON: один ответ,
+        список ответов с полем items или просто список событий)"""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = [data]
+        if data and "items" in data[0]:
+            data = [event for response in data for event in response["items"]]
+        return cls(data, latency)
+
+    def events(self):
+        return _Events(self)
+
+    def freebusy(self):
+        return _FreeBusy(self)
+
+    def new_batch_http_request(self, callback):
+        return _Batch(self, callback)
+
+
+def generate_events(count, start, days, tz, seed=0):
+    """Создает count событий в рабочие часы days дней начиная с start
+
+    Поля повторяют ответ events().list с маской calendar_sync.EVENT_FIELDS;
+    примерно каждое десятое событие — отклоненное приглашение.
+    """
+    rng = random.Random(seed)
+    events = []
+    for index in range(count):
+        day = start + timedelta(days=rng.randrange(days))
+        begin = tz.localize(
+            datetime(day.year, day.month, day.day, rng.randrange(8, 19))
+        ) + timedelta(minutes=rng.choice((0, 15, 30, 45)))
+        end = begin + timedelta(minutes=rng.choice((15, 30, 60, 90, 120)))
+        event = {
+            "id": f"event-{index}",
+            "status": "confirmed",
+            "start": {"dateTime": begin.isoformat()},
+            "end": {"dateTime": end.isoformat()},
+        }
+        if rng.random() < 0.1:
+            event["attendees"] = [{"self": True, "responseStatus": "declined"}]
+        events.append(event)
+    return events
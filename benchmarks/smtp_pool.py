@@ -0,0 +1,66 @@
+"""Сравнение отправки уведомлений через новое SMTP-соединение и через пул
+
+Письма отправляются на локальный SMTP-сервер из benchmarks/fakes.py,
+задержка на приветствие и вход имитирует TLS-рукопожатие Gmail.
+Запуск из корня репозитория:
+
+    python benchmarks/smtp_pool.py --bookings 50 --latency 0.05
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import SMTPSink  # noqa: E402
+from notifications import SMTPPool, send_booking_emails  # noqa: E402
+
+
+def run(bookings, sink, reuse):
+    """Отправляет письма bookings бронирований и возвращает время в секундах"""
+    pool = SMTPPool(
+        "127.0.0.1", sink.port, "sender@example.com", "secret", use_ssl=False
+    )
+    started = time.perf_counter()
+    for i in range(bookings):
+        send_booking_emails(pool, "01/01/2030 10:00", f"guest{i}@example.com")
+        if not reuse:
+            # Прежнее поведение: новое соединение и вход для каждого бронирования
+            pool.close()
+    elapsed = time.perf_counter() - started
+    pool.close()
+    return elapsed, pool.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookings", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--output", help="Путь к JSON-отчету")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    report = {}
+    with SMTPSink(latency=args.latency) as sink:
+        for name, reuse in (("connection_per_booking", False), ("pooled", True)):
+            elapsed, stats = run(args.bookings, sink, reuse)
+            report[name] = {
+                "total_s": round(elapsed, 3),
+                "per_booking_ms": round(elapsed / args.bookings * 1000, 2),
+                **stats,
+            }
+        report["messages_received"] = len(sink.messages)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Замер холодного старта: импорт модулей и сборка сервиса Calendar
+
+Каждый сценарий выполняется в отдельном процессе, чтобы модули не
+оказались закэшированы в sys.modules. Запуск из корня репозитория:
+
+    python benchmarks/startup.py --runs 10 --output startup.json
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def app_imports():
+    """Блок импортов в начале app.py (до первой инструкции, кроме импортов)
+
+    Берется из самого app.py, чтобы сценарий не расходился с приложением
+    при добавлении модулей.
+    """
+    with open(os.path.join(ROOT, "app.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    imports = []
+    for node in tree.body:
+        if not isinstance(node, (ast.Import, ast.ImportFrom)):
+            break
+        imports.append(ast.unparse(node))
+    return "\n".join(imports)
+
+
+SCENARIOS = {
+    # Общая часть обоих вариантов: Streamlit и зависимости страницы
+    "framework_imports": """
+import pytz
+import streamlit as st
+from dotenv import load_dotenv
+""",
+    # Импорты, которые раньше выполнялись в начале app.py
+    "eager_imports": """
+import pytz
+import streamlit as st
+from dotenv import load_dotenv
+import smtplib
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+""",
+    # Импорты, которые app.py выполняет при старте сейчас
+    "lazy_imports": app_imports(),
+    # Сборка сервиса через discovery-документ из googleapiclient
+    "build_discovery": """
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+build("calendar", "v3", credentials=Credentials("token"))
+""",
+    # Сборка сервиса из зафиксированного документа в репозитории
+    "build_from_document": """
+from google.oauth2.credentials import Credentials
+from calendar_service import CalendarServiceCache
+CalendarServiceCache._build_service(Credentials("token"))
+""",
+}
+
+TIMER = """
+import time
+_started = time.perf_counter()
+{body}
+print(time.perf_counter() - _started)
+"""
+
+
+def run_scenario(body, runs):
+    """Запускает сценарий runs раз и возвращает время в миллисекундах"""
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", TIMER.format(body=body)],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        timings.append(float(result.stdout.strip().splitlines()[-1]) * 1000)
+    return {
+        "median_ms": round(statistics.median(timings), 2),
+        "min_ms": round(min(timings), 2),
+        "max_ms": round(max(timings), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Путь к JSON-отчету")
+    args = parser.parse_args()
+
+    report = {name: run_scenario(body, args.runs) for name, body in SCENARIOS.items()}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""Офлайн-бенчмарки расчета доступности и бронирования
+
+Calendar API заменяется FakeCalendarService с событиями заданного размера
+(или записанными ответами events().list), SMTP — локальным SMTPSink из
+benchmarks/fakes.py, поэтому к сервисам Google запросов нет. Запуск из
+корня репозитория:
+
+    python benchmarks/suite.py --sizes 10 1000 10000 --output report.json
+    python benchmarks/suite.py --baseline report.json
+
+С --baseline выводится отношение времени к прошлому отчету по каждой
+метрике (меньше 1 — быстрее).
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pytz  # noqa: E402
+
+from availability import Schedule  # noqa: E402
+from availability_cache import AvailabilityCache  # noqa: E402
+from benchmarks.fakes import (  # noqa: E402
+    FakeCalendarService,
+    SMTPSink,
+    generate_events,
+)
+from booking import book_slots, build_event_body, insert_event  # noqa: E402
+from calendar_sync import EventStore, compute_slot_grid  # noqa: E402
+from metrics import metrics  # noqa: E402
+from notifications import SMTPPool, send_booking_emails  # noqa: E402
+from reservations import SlotReservations  # noqa: E402
+
+TZ = pytz.timezone("Europe/Moscow")
+SCHEDULE = Schedule()
+
+
+def window_start():
+    now = datetime.now(TZ)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+
+def make_service(size, args, start):
+    if args.events_file:
+        return FakeCalendarService.from_file(args.events_file, args.api_latency)
+    events = generate_events(size, start, SCHEDULE.window_days, TZ)
+    return FakeCalendarService(events, args.api_latency)
+
+
+def timings(values):
+    """Медиана, p95 и максимум в миллисекундах"""
+    values = sorted(value * 1000 for value in values)
+    return {
+        "median_ms": round(statistics.median(values), 3),
+        "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+        "max_ms": round(values[-1], 3),
+    }
+
+
+def compute_grid(service, start, store, backend="events"):
+    """Один расчет сетки окна тем же кодом, что и в приложении"""
+    return compute_slot_grid(
+        service, store, start, SCHEDULE.window_days, SCHEDULE, backend
+    )
+
+
+def stage_timings():
+    """Число замеров и среднее время по этапам из metrics
+
+    Квантили metrics — границы корзин гистограммы, для сравнения с прошлым
+    отчетом они слишком грубые, поэтому в отчет попадает только среднее.
+    """
+    return {
+        row["stage"]: {"count": row["count"], "mean_ms": round(row["mean_ms"], 3)}
+        for row in metrics.summary()
+    }
+
+
+def bench_slot_computation(size, args):
+    """Полная и инкрементальная синхронизация, freeBusy, сетка и память
+
+    Время этапов внутри расчета собирается теми же замерами metrics, что и
+    в приложении, отдельно для каждого режима.
+    """
+    start = window_start()
+    service = make_service(size, args, start)
+    stores = [EventStore("primary", TZ) for _ in range(args.runs)]
+    runs, stages = {}, {}
+    for mode, backend in (
+        ("full_sync", "events"),
+        ("incremental", "events"),
+        ("freebusy", "freebusy"),
+    ):
+        metrics.reset()
+        values = []
+        for store in stores:
+            started = time.perf_counter()
+            grid = compute_grid(service, start, store, backend)
+            values.append(time.perf_counter() - started)
+        runs[mode] = timings(values)
+        stages[mode] = stage_timings()
+
+    # Пиковая память Python на полную синхронизацию и расчет сетки
+    tracemalloc.start()
+    compute_grid(service, start, EventStore("primary", TZ))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "events": len(service.recorded),
+        "slots": len(grid),
+        "busy_slots": int(grid.busy_mask().sum()),
+        **runs,
+        "stages": stages,
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+
+def free_slots(grid):
+    mask = grid.busy_mask()
+    return [
+        datetime.fromtimestamp(int(minutes) * 60, TZ)
+        for minutes, busy in zip(grid.minutes, mask)
+        if not busy
+    ]
+
+
+def bench_booking(args, sink):
+    """Бронирование: резерв, создание события, подтверждение и отправка писем,
+    а также пакетное бронирование через book_slots"""
+    start = window_start()
+    service = make_service(args.booking_events, args, start)
+    grid = compute_grid(service, start, EventStore("primary", TZ))
+    available = free_slots(grid)
+    slots = available[: args.bookings]
+    if not slots:
+        raise SystemExit("Нет свободных слотов: уменьшите --booking-events")
+    reservations = SlotReservations()
+    pool = SMTPPool(
+        "127.0.0.1", sink.port, "sender@example.com", "secret", use_ssl=False
+    )
+
+    request_path, delivery = [], []
+    for index, slot in enumerate(slots):
+        owner = f"session-{index}"
+        booker_email = f"guest{index}@example.com"
+        started = time.perf_counter()
+        reservations.reserve(slot, slot + SCHEDULE.duration_delta, owner)
+        body = build_event_body(
+            slot, booker_email, "sender@example.com", TZ, SCHEDULE.duration_delta
+        )
+        insert_event(service, "primary", body)
+        reservations.confirm(slot, owner, slot + SCHEDULE.duration_delta)
+        request_path.append(time.perf_counter() - started)
+
+        # Письма отправляет фоновая очередь, здесь замеряется сама доставка
+        started = time.perf_counter()
+        send_booking_emails(pool, slot.strftime("%d/%m/%Y %H:%M"), booker_email)
+        delivery.append(time.perf_counter() - started)
+    pool.close()
+
+    # Массовое бронирование следующих свободных слотов одним пакетом
+    batch_slots = available[args.bookings : 2 * args.bookings]
+    started = time.perf_counter()
+    batch_results = book_slots(
+        service,
+        "primary",
+        batch_slots,
+        "group@example.com",
+        "sender@example.com",
+        TZ,
+        reservations,
+        "batch",
+        SCHEDULE.duration_delta,
+    )
+    batch_elapsed = time.perf_counter() - started
+
+    return {
+        "bookings": len(slots),
+        "request_path": timings(request_path),
+        "batch": {
+            "slots": len(batch_slots),
+            "booked": sum(result["ok"] for result in batch_results),
+            "total_ms": round(batch_elapsed * 1000, 3),
+        },
+        "email_delivery": timings(delivery),
+        "smtp": pool.stats(),
+    }
+
+
+def bench_concurrency(args):
+    """Одновременные сессии: общий кэш доступности и борьба за слоты"""
+    start = window_start()
+    service = make_service(args.booking_events, args, start)
+    cache = AvailabilityCache()
+    store = EventStore("primary", TZ)
+    reservations = SlotReservations()
+    key = ("primary", start, SCHEDULE.window_days)
+    lock = threading.Lock()
+    outcomes = {"reserved": 0, "rejected": 0}
+    latencies = []
+
+    def session(index):
+        rng = random.Random(index)
+        started = time.perf_counter()
+        grid = cache.get_or_compute(
+            key, lambda: compute_grid(service, start, store), ttl=60
+        )
+        # Сессии выбирают из нескольких первых свободных слотов, чтобы
+        # резервы конфликтовали, как при наплыве посетителей
+        slot = rng.choice(free_slots(grid)[: args.contended_slots])
+        reserved = reservations.reserve(
+            slot, slot + SCHEDULE.duration_delta, f"session-{index}"
+        )
+        if reserved:
+            insert_event(
+                service,
+                "primary",
+                build_event_body(slot, f"guest{index}@example.com", "", TZ),
+            )
+        elapsed = time.perf_counter() - started
+        with lock:
+            outcomes["reserved" if reserved else "rejected"] += 1
+            latencies.append(elapsed)
+
+    threads = [
+        threading.Thread(target=session, args=(index,))
+        for index in range(args.sessions)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "sessions": args.sessions,
+        "total_s": round(elapsed, 3),
+        "sessions_per_second": round(args.sessions / elapsed, 1),
+        "session": timings(latencies),
+        "cache": cache.stats(),
+        "events_list_calls": service.list_calls,
+        **outcomes,
+    }
+
+
+def compare(report, baseline, prefix=""):
+    """Отношения времени к прошлому отчету для метрик *_ms и *_s"""
+    ratios = {}
+    for name, value in report.items():
+        path = f"{prefix}{name}"
+        if isinstance(value, dict) and isinstance(baseline.get(name), dict):
+            ratios.update(compare(value, baseline[name], f"{path}."))
+        elif (
+            name.endswith(("_ms", "_s"))
+            and isinstance(baseline.get(name), (int, float))
+            and baseline[name]
+        ):
+            ratios[path] = round(value / baseline[name], 2)
+    return ratios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--bookings", type=int, default=20)
+    parser.add_argument(
+        "--booking-events",
+        type=int,
+        default=50,
+        help="Событий в календаре для бронирования и сессий (нужны свободные слоты)",
+    )
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--contended-slots", type=int, default=5)
+    parser.add_argument(
+        "--api-latency", type=float, default=0.0, help="Задержка Calendar API, с"
+    )
+    parser.add_argument(
+        "--smtp-latency", type=float, default=0.0, help="Задержка входа SMTP, с"
+    )
+    parser.add_argument(
+        "--events-file", help="Записанные ответы events().list вместо генерации"
+    )
+    parser.add_argument("--output", help="Путь к JSON-отчету")
+    parser.add_argument("--baseline", help="Прошлый JSON-отчет для сравнения")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    metrics.enabled = True
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "args": vars(args),
+        },
+        "slot_computation": {
+            str(size): bench_slot_computation(size, args) for size in args.sizes
+        },
+    }
+    with SMTPSink(latency=args.smtp_latency) as sink:
+        report["booking"] = bench_booking(args, sink)
+    report["concurrency"] = bench_concurrency(args)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        ratios = compare(report, baseline)
+        print(json.dumps(ratios, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Создание событий бронирования в Google Calendar"""
+
+import uuid
+from datetime import timedelta
+
+from availability import format_duration
+
+# Google ограничивает пакетный запрос Calendar API 50 вложенными запросами
+BATCH_LIMIT = 50
+
+
+def build_event_body(
+    slot_time, booker_email, organizer_email, tz, duration=timedelta(hours=1)
+):
+    """Формирует тело события встречи для events().insert"""
+    # Убеждаемся, что используем время в часовом поясе календаря
+    if slot_time.tzinfo != tz:
+        slot_time = slot_time.astimezone(tz)
+
+    return {
+        "summary": f"👥 Встреча с {booker_email}",
+        "description": f"""
+Детали встречи:
+
+👤 Участник: {booker_email}
+⏱️ Продолжительность: {format_duration(duration // timedelta(minutes=1))}
+📍 Место: Google Meet (ссылка будет сгенерирована автоматически)
+
+Эта встреча была забронирована через систему планирования встреч.
+Вы можете принять, отклонить или предложить другое время, используя опции выше.
+
+Нужно связаться с участником? Ответьте на это приглашение или используйте email: {booker_email}
+""",
+        "start": {
+            "dateTime": slot_time.isoformat(),
+            "timeZone": tz.zone,
+        },
+        "end": {
+            "dateTime": (slot_time + duration).isoformat(),
+            "timeZone": tz.zone,
+        },
+        "attendees": [
+            {"email": booker_email},
+            {"email": organizer_email},
+        ],
+        "sendUpdates": "all",  # Отправляем уведомления всем участникам
+        "reminders": {
+            "useDefault": False,
+            "overrides": [
+                {"method": "email", "minutes": 60},  # Email за час до встречи
+                {
+                    "method": "popup",
+                    "minutes": 10,
+                },  # Всплывающее уведомление за 10 минут
+            ],
+        },
+        "conferenceData": {
+            "createRequest": {
+                # Уникален для каждого события, даже созданного в той же секунде
+                "requestId": f"meeting_{uuid.uuid4().hex}",
+                "conferenceSolutionKey": {"type": "hangoutsMeet"},
+            }
+        },
+    }
+
+
+def _insert_request(service, calendar_id, body):
+    return service.events().insert(
+        calendarId=calendar_id,
+        body=body,
+        conferenceDataVersion=1,  # Добавляем поддержку Google Meet
+        sendUpdates="all",  # Отправляем уведомления всем участникам
+    )
+
+
+def insert_event(service, calendar_id, body):
+    """Создает одно событие и возвращает ответ API"""
+    return _insert_request(service, calendar_id, body).execute()
+
+
+def insert_events_batch(service, calendar_id, bodies):
+    """Создает события пакетными HTTP-запросами по BATCH_LIMIT штук
+
+    Возвращает список результатов в порядке bodies: словари с ключом ok и
+    либо event (ответ API), либо error (текст ошибки).
+    """
+    results = [None] * len(bodies)
+
+    def callback(request_id, response, exception):
+        index = int(request_id)
+        if exception is None:
+            results[index] = {"ok": True, "event": response}
+        else:
+            results[index] = {"ok": False, "error": str(exception)}
+
+    for offset in range(0, len(bodies), BATCH_LIMIT):
+        indexes = range(offset, min(offset + BATCH_LIMIT, len(bodies)))
+        batch = service.new_batch_http_request(callback=callback)
+        for index in indexes:
+            batch.add(
+                _insert_request(service, calendar_id, bodies[index]),
+                request_id=str(index),
+            )
+        try:
+            batch.execute()
+        except Exception as e:
+            # Пакет не дошел до сервера: его запросы без ответа считаем неудачными
+            for index in indexes:
+                if results[index] is None:
+                    results[index] = {"ok": False, "error": str(e)}
+
+    return results
+
+
+def book_slots(
+    service,
+    calendar_id,
+    slot_times,
+    booker_email,
+    organizer_email,
+    tz,
+    reservations,
+    owner,
+    duration=timedelta(hours=1),
+):
+    """Бронирует несколько слотов одним пакетным запросом
+
+    Используется для массового бронирования (регулярные приемные часы,
+    групповые встречи). В пакет попадают только слоты, которые удалось
+    зарезервировать за owner; резерв созданного события подтверждается,
+    неудавшегося — снимается. Возвращает список результатов в порядке
+    slot_times без повторов: словари insert_events_batch с добавленным
+    slot_time.
+    """
+    # Повторный слот того же владельца снова прошел бы резерв и создал бы
+    # второе событие
+    slot_times = list(dict.fromkeys(slot_times))
+    reserved = [
+        slot_time
+        for slot_time in slot_times
+        if reservations.reserve(slot_time, slot_time + duration, owner)
+    ]
+    bodies = [
+        build_event_body(slot_time, booker_email, organizer_email, tz, duration)
+        for slot_time in reserved
+    ]
+    batch_results = dict(
+        zip(reserved, insert_events_batch(service, calendar_id, bodies))
+    )
+
+    results = []
+    for slot_time in slot_times:
+        result = batch_results.get(
+            slot_time, {"ok": False, "error": "слот зарезервирован другой сессией"}
+        )
+        result["slot_time"] = slot_time
+        results.append(result)
+        if result["ok"]:
+            reservations.confirm(slot_time, owner, slot_time + duration)
+        elif slot_time in batch_results:
+            reservations.release(slot_time, owner)
+    return results
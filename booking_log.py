@@ -0,0 +1,292 @@
+"""Структурированный журнал событий бронирования в SQLite
+
+Запросы из командной строки (из корня репозитория):
+
+    python booking_log.py booking_events.db count --outcome smtp_auth_error --since 7d
+    python booking_log.py booking_events.db summary --since 24h
+    python booking_log.py booking_events.db events --email guest@example.com
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# Виды событий
+EVENT_CREATED = "event_created"
+EMAIL_QUEUED = "email_queued"
+EMAIL_SENT = "email_sent"
+
+# Что считается одним случаем в count и summary: задание очереди писем
+# (повторные попытки с тем же job_id не умножают счет) или отдельная запись
+_CASE = "COALESCE(kind || ':' || job_id, id)"
+
+
+class BookingLog:
+    """Журнал исходов бронирования и отправки писем
+
+    Каждая запись — время, вид события, исход ("ok", "error",
+    "smtp_auth_error", ...), email участника, слот и детали в JSON. Индексы
+    по времени, email и исходу позволяют считать, например, ошибки
+    авторизации SMTP за неделю без полного просмотра таблицы.
+
+    Записи пишет фоновый поток, поэтому бронирование не ждет SQLite, а
+    ошибка журнала не влияет на исход бронирования и доставки писем.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        with self._connect() as connection:
+            # WAL: чтение из CLI не блокирует запись из приложения
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS booking_events (
+                    id INTEGER PRIMARY KEY,
+                    ts REAL NOT NULL,
+                    kind TEXT NOT NULL,
+                    outcome TEXT NOT NULL,
+                    booker_email TEXT,
+                    slot TEXT,
+                    detail TEXT,
+                    job_id TEXT,
+                    attempt INTEGER
+                );
+                CREATE INDEX IF NOT EXISTS booking_events_ts
+                    ON booking_events (ts);
+                CREATE INDEX IF NOT EXISTS booking_events_email
+                    ON booking_events (booker_email, ts);
+                CREATE INDEX IF NOT EXISTS booking_events_outcome
+                    ON booking_events (outcome, ts);
+                """)
+            columns = {
+                row[1]
+                for row in connection.execute("PRAGMA table_info(booking_events)")
+            }
+            # Журналы прежней версии: добавляем колонки задания очереди
+            for column, column_type in (("job_id", "TEXT"), ("attempt", "INTEGER")):
+                if column not in columns:
+                    connection.execute(
+                        f"ALTER TABLE booking_events ADD COLUMN {column} {column_type}"
+                    )
+
+    def record(
+        self,
+        kind,
+        outcome,
+        booker_email=None,
+        slot=None,
+        job_id=None,
+        attempt=None,
+        **detail,
+    ):
+        """Ставит запись в очередь записи и никогда не бросает исключений
+
+        slot — datetime или строка, job_id и attempt — задание очереди писем
+        и номер попытки, detail — поля JSON.
+        """
+        try:
+            if isinstance(slot, datetime):
+                slot = slot.isoformat()
+            row = (
+                time.time(),
+                kind,
+                outcome,
+                booker_email,
+                slot,
+                json.dumps(detail, ensure_ascii=False, default=str) if detail else None,
+                job_id,
+                attempt,
+            )
+            self._start()
+            self._queue.put(row)
+        except Exception as e:
+            logging.error(f"Запись журнала бронирований пропущена: {str(e)}")
+
+    def flush(self):
+        """Ждет, пока фоновый поток запишет все поставленные записи"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def count(self, **filters):
+        """Количество случаев по фильтрам (см. events); повторные попытки
+        одного задания очереди писем считаются одним случаем"""
+        where, params = _where(**filters)
+        with self._connect() as connection:
+            return connection.execute(
+                f"SELECT COUNT(DISTINCT {_CASE}) FROM booking_events {where}", params
+            ).fetchone()[0]
+
+    def summary(self, **filters):
+        """Количество случаев по видам событий и исходам"""
+        where, params = _where(**filters)
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT kind, outcome, COUNT(DISTINCT {_CASE}) "
+                f"FROM booking_events {where} "
+                "GROUP BY kind, outcome ORDER BY kind, outcome",
+                params,
+            ).fetchall()
+        return [{"kind": k, "outcome": o, "count": n} for k, o, n in rows]
+
+    def events(self, limit=100, **filters):
+        """Последние записи, новые первыми
+
+        Фильтры: since и until (timestamp или datetime), kind, outcome,
+        email, job_id.
+        """
+        where, params = _where(**filters)
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT ts, kind, outcome, booker_email, slot, detail, job_id, "
+                f"attempt FROM booking_events {where} ORDER BY ts DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [
+            {
+                "time": datetime.fromtimestamp(ts).isoformat(timespec="seconds"),
+                "kind": kind,
+                "outcome": outcome,
+                "booker_email": email,
+                "slot": slot,
+                "job_id": job_id,
+                "attempt": attempt,
+                "detail": json.loads(detail) if detail else {},
+            }
+            for ts, kind, outcome, email, slot, detail, job_id, attempt in rows
+        ]
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="booking-log", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            rows = [self._queue.get()]
+            # Записи, накопившиеся за время предыдущей вставки, пишем одной
+            # транзакцией
+            while True:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._connect() as connection:
+                    for row in rows:
+                        try:
+                            connection.execute(
+                                "INSERT INTO booking_events (ts, kind, outcome, "
+                                "booker_email, slot, detail, job_id, attempt) "
+                                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                row,
+                            )
+                        except (sqlite3.InterfaceError, sqlite3.ProgrammingError) as e:
+                            # Неподдерживаемое значение поля: теряем только
+                            # эту запись, а не всю пачку
+                            logging.error(
+                                f"Запись журнала бронирований пропущена: {str(e)}"
+                            )
+            except Exception as e:
+                logging.error(
+                    f"Не удалось записать {len(rows)} записей журнала бронирований: "
+                    f"{str(e)}"
+                )
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    @contextlib.contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+
+def _where(since=None, until=None, kind=None, outcome=None, email=None, job_id=None):
+    conditions, params = [], []
+    for column, operator, value in (
+        ("ts", ">=", since),
+        ("ts", "<", until),
+        ("kind", "=", kind),
+        ("outcome", "=", outcome),
+        ("booker_email", "=", email),
+        ("job_id", "=", job_id),
+    ):
+        if value is None:
+            continue
+        if isinstance(value, datetime):
+            value = value.timestamp()
+        conditions.append(f"{column} {operator} ?")
+        params.append(value)
+    return ("WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def get_booking_log(path):
+    """Возвращает общий для процесса журнал в файле path"""
+    with _logs_lock:
+        if path not in _logs:
+            _logs[path] = BookingLog(path)
+        return _logs[path]
+
+
+_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def _parse_time(value):
+    """ "7d", "24h", "30m" — столько назад от текущего момента, иначе ISO-дата"""
+    if value[-1:] in _UNITS and value[:-1].isdigit():
+        return time.time() - int(value[:-1]) * _UNITS[value[-1]]
+    return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db", help="Путь к файлу журнала SQLite")
+    parser.add_argument("command", choices=("count", "summary", "events"))
+    parser.add_argument("--since", type=_parse_time, help="7d, 24h или ISO-дата")
+    parser.add_argument("--until", type=_parse_time, help="7d, 24h или ISO-дата")
+    parser.add_argument("--kind", choices=(EVENT_CREATED, EMAIL_QUEUED, EMAIL_SENT))
+    parser.add_argument("--outcome")
+    parser.add_argument("--email")
+    parser.add_argument("--job", help="id задания очереди писем")
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    log = BookingLog(args.db)
+    filters = {
+        "since": args.since,
+        "until": args.until,
+        "kind": args.kind,
+        "outcome": args.outcome,
+        "email": args.email,
+        "job_id": args.job,
+    }
+    if args.command == "count":
+        print(log.count(**filters))
+    elif args.command == "summary":
+        print(json.dumps(log.summary(**filters), indent=2, ensure_ascii=False))
+    else:
+        events = log.events(args.limit, **filters)
+        print(json.dumps(events, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
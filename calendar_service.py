@@ -0,0 +1,115 @@
+"""Общий для всего процесса кэш сервиса Google Calendar и учетных данных"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+SCOPES = ["https://www.googleapis.com/auth/calendar"]
+
+# Зафиксированная версия discovery-документа Calendar API v3 (ревизия 20240201,
+# из google-api-python-client 2.118.0): сервис собирается без сетевого запроса
+DISCOVERY_DOCUMENT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "discovery", "calendar.v3.json"
+)
+
+# Обновляем access token заранее, не дожидаясь его истечения
+REFRESH_MARGIN = timedelta(minutes=5)
+
+
+class CalendarServiceCache:
+    """Хранит один сервис Calendar на процесс и переиспользует access token
+
+    Сервис и учетные данные создаются при первом обращении и пересоздаются
+    только при смене секретов. Токен обновляется под блокировкой, поэтому
+    параллельные сессии Streamlit не запрашивают его одновременно.
+    """
+
+    def __init__(self, refresh_margin=REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._key = None
+        self._credentials = None
+        self._service = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def get(self, client_id, client_secret, refresh_token, token_uri):
+        """Возвращает сервис Calendar с действующим access token"""
+        key = (client_id, client_secret, refresh_token, token_uri)
+        with self._lock:
+            if self._service is None or self._key != key:
+                # googleapiclient и google.auth загружаются только при первой
+                # сборке сервиса, а не при старте приложения
+                from google.oauth2.credentials import Credentials
+
+                self.misses += 1
+                self._credentials = Credentials(
+                    None,  # access token будет получен при первом обновлении
+                    refresh_token=refresh_token,
+                    token_uri=token_uri,
+                    client_id=client_id,
+                    client_secret=client_secret,
+                    scopes=SCOPES,
+                )
+                self._service = self._build_service(self._credentials)
+                self._key = key
+            else:
+                self.hits += 1
+
+            if self._needs_refresh():
+                from google.auth.transport.requests import Request
+
+                self._credentials.refresh(Request())
+                self.refreshes += 1
+
+            return self._service
+
+    def invalidate(self):
+        """Сбрасывает сервис и токен (например, после отзыва доступа)"""
+        with self._lock:
+            self._key = None
+            self._credentials = None
+            self._service = None
+
+    def stats(self):
+        """Возвращает счетчики попаданий, промахов и обновлений токена"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+        }
+
+    def _needs_refresh(self):
+        credentials = self._credentials
+        if not credentials.token or credentials.expiry is None:
+            return True
+        # expiry хранится в UTC без часового пояса
+        return credentials.expiry - datetime.utcnow() < self.refresh_margin
+
+    @staticmethod
+    def _build_service(credentials):
+        import google_auth_httplib2
+        import httplib2
+        from googleapiclient.discovery import build_from_document
+        from googleapiclient.http import HttpRequest
+
+        with open(DISCOVERY_DOCUMENT, "r", encoding="utf-8") as f:
+            document = f.read()
+
+        # httplib2.Http не потокобезопасен, поэтому каждый запрос получает
+        # собственное соединение, а учетные данные остаются общими
+        def build_request(http, *args, **kwargs):
+            authorized_http = google_auth_httplib2.AuthorizedHttp(
+                credentials, http=httplib2.Http()
+            )
+            return HttpRequest(authorized_http, *args, **kwargs)
+
+        return build_from_document(
+            document, credentials=credentials, requestBuilder=build_request
+        )
+
+
+# Модули сохраняются между перезапусками скрипта Streamlit, поэтому
+# кэш живет столько же, сколько процесс
+service_cache = CalendarServiceCache()
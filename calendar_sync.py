@@ -0,0 +1,224 @@
+"""Источники занятости календаря: инкрементальная синхронизация событий
+через syncToken и компактный запрос freeBusy"""
+
+import threading
+from datetime import datetime, timedelta
+
+from availability import BusyIntervals, build_slot_grid, event_interval
+from metrics import metrics
+
+# Максимальный размер страницы events().list
+MAX_RESULTS = 2500
+
+# Запрашиваем только поля, нужные для расчета занятости
+EVENT_FIELDS = (
+    "nextPageToken,nextSyncToken,"
+    "items(id,status,start,end,attendees(self,responseStatus))"
+)
+
+
+class EventPages:
+    """Потоковый итератор по событиям календаря с переходом по nextPageToken
+
+    Страницы запрашиваются по мере чтения, поэтому в памяти находится не
+    больше одной страницы ответа. После полного прохода в next_sync_token
+    сохраняется токен для следующей инкрементальной синхронизации.
+    """
+
+    def __init__(self, service, calendar_id, **params):
+        self.service = service
+        self.calendar_id = calendar_id
+        self.params = params
+        self.next_sync_token = None
+
+    def __iter__(self):
+        page_token = None
+        while True:
+            response = (
+                self.service.events()
+                .list(
+                    calendarId=self.calendar_id,
+                    pageToken=page_token,
+                    maxResults=MAX_RESULTS,
+                    fields=EVENT_FIELDS,
+                    **self.params,
+                )
+                .execute()
+            )
+            yield from response.get("items", [])
+
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                self.next_sync_token = response.get("nextSyncToken")
+                return
+
+
+class EventStore:
+    """Локальная копия занятых интервалов календаря
+
+    Первая синхронизация загружает все события начиная с time_min и
+    запоминает nextSyncToken. Последующие запрашивают только изменения с
+    момента прошлой синхронизации. Если токен устарел (410 Gone), выполняется
+    полная повторная синхронизация.
+    """
+
+    def __init__(self, calendar_id, tz):
+        self.calendar_id = calendar_id
+        self.tz = tz
+        self._lock = threading.Lock()
+        self._intervals = {}  # id события -> (начало, конец)
+        self._sync_token = None
+        self._time_min = None
+        self.last_sync = None
+        self.full_syncs = 0
+        self.incremental_syncs = 0
+
+    @property
+    def synced(self):
+        """Выполнена ли уже первая полная синхронизация"""
+        return self._sync_token is not None
+
+    def sync(self, service, time_min):
+        """Синхронизирует хранилище с календарем"""
+        from googleapiclient.errors import HttpError
+
+        with self._lock:
+            if self._sync_token is None or time_min < self._time_min:
+                self._full_sync(service, time_min)
+            else:
+                try:
+                    self._incremental_sync(service)
+                except HttpError as e:
+                    if e.resp.status != 410:
+                        raise
+                    # Токен синхронизации устарел, загружаем календарь заново
+                    self._full_sync(service, time_min)
+
+            # Удаляем события, которые уже закончились до начала окна
+            for event_id, (_, end) in list(self._intervals.items()):
+                if end <= time_min:
+                    del self._intervals[event_id]
+
+            self.last_sync = datetime.now(self.tz)
+
+    def busy_intervals(self, time_min, time_max):
+        """Возвращает занятые интервалы, пересекающиеся с окном [time_min, time_max)"""
+        with self._lock:
+            return BusyIntervals(
+                (start, end)
+                for start, end in self._intervals.values()
+                if start < time_max and end > time_min
+            )
+
+    def _full_sync(self, service, time_min):
+        self._intervals = {}
+        self._sync_token = None
+        self._time_min = time_min
+        self._sync_token = self._apply_pages(
+            service, timeMin=time_min.isoformat(), singleEvents=True
+        )
+        self.full_syncs += 1
+
+    def _incremental_sync(self, service):
+        self._sync_token = self._apply_pages(
+            service, syncToken=self._sync_token, singleEvents=True
+        )
+        self.incremental_syncs += 1
+
+    def _apply_pages(self, service, **params):
+        """Применяет события всех страниц к хранилищу и возвращает nextSyncToken"""
+        pages = EventPages(service, self.calendar_id, **params)
+        for event in pages:
+            self._apply_event(event)
+        return pages.next_sync_token
+
+    def _apply_event(self, event):
+        # Удаленные события приходят со статусом cancelled
+        interval = None
+        if event.get("status") != "cancelled":
+            interval = event_interval(event, self.tz)
+
+        if interval is None:
+            self._intervals.pop(event["id"], None)
+        else:
+            self._intervals[event["id"]] = interval
+
+
+def query_busy_intervals(service, calendar_id, time_min, time_max, tz):
+    """Запрашивает занятые интервалы через freeBusy вместо полного списка событий
+
+    Ответ содержит только диапазоны занятости без описаний и участников.
+    Отклоненные приглашения и события со статусом «свободен» Google
+    не учитывает сам.
+    """
+    response = (
+        service.freebusy()
+        .query(
+            body={
+                "timeMin": time_min.isoformat(),
+                "timeMax": time_max.isoformat(),
+                "timeZone": tz.zone,
+                "items": [{"id": calendar_id}],
+            }
+        )
+        .execute()
+    )
+
+    calendar = response.get("calendars", {}).get(calendar_id, {})
+    if calendar.get("errors"):
+        reasons = ", ".join(error.get("reason", "") for error in calendar["errors"])
+        raise RuntimeError(f"freeBusy вернул ошибку для календаря: {reasons}")
+
+    return BusyIntervals(
+        (
+            datetime.fromisoformat(period["start"]).astimezone(tz),
+            datetime.fromisoformat(period["end"]).astimezone(tz),
+        )
+        for period in calendar.get("busy", [])
+    )
+
+
+def compute_slot_grid(service, store, start_date, days, schedule, backend="events"):
+    """Расчет сетки свободных и занятых слотов первых days дней окна
+
+    Занятость берется из локальной копии календаря store (синхронизация
+    через syncToken) или, при backend="freebusy", запросом freeBusy. Этапы
+    замеряются в metrics.
+    """
+    end_date = start_date + timedelta(days=days)
+
+    if backend == "freebusy" or (not store.synced and days < schedule.window_days):
+        # Только диапазоны занятости, без тел событий. Первые дни до
+        # завершения первой полной синхронизации тоже считаются так, чтобы
+        # страница не ждала загрузки всех событий календаря
+        with metrics.span("calendar.freebusy"):
+            busy = query_busy_intervals(
+                service, store.calendar_id, start_date, end_date, store.tz
+            )
+    else:
+        # Синхронизируем локальную копию календаря: после первой полной
+        # загрузки запрашиваются только изменившиеся события
+        with metrics.span("calendar.events_list"):
+            store.sync(service, start_date)
+
+        # Занятые интервалы в пределах окна
+        with metrics.span("availability.busy_intervals"):
+            busy = store.busy_intervals(start_date, end_date)
+
+    # Сетка рабочих слотов по расписанию с признаком занятости,
+    # рассчитанная целиком на массивах NumPy
+    with metrics.span("availability.slot_grid"):
+        return build_slot_grid(start_date, days, store.tz, busy, schedule)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_event_store(calendar_id, tz):
+    """Возвращает общее для процесса хранилище событий календаря"""
+    with _stores_lock:
+        key = (calendar_id, tz.zone)
+        if key not in _stores:
+            _stores[key] = EventStore(calendar_id, tz)
+        return _stores[key]
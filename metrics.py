@@ -0,0 +1,148 @@
+"""Замеры длительности этапов бронирования и расчета доступности"""
+
+import bisect
+import contextlib
+import logging
+import os
+import threading
+import time
+
+# Верхние границы корзин гистограммы в секундах (как у Prometheus)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_DISABLED = contextlib.nullcontext()
+
+
+class StageHistogram:
+    """Гистограмма длительностей одного этапа"""
+
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # последняя корзина — +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q):
+        """Оценка квантиля q по верхней границе корзины"""
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """Реестр гистограмм длительности этапов
+
+    Этапы замеряются контекстным менеджером span(). Если замеры выключены
+    (enabled = False), span() возвращает общий пустой контекстный менеджер
+    и не обращается к часам и блокировкам.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._exporter = None
+        self.export_path = None
+
+    def span(self, stage):
+        """Контекстный менеджер, замеряющий длительность этапа stage"""
+        if not self.enabled:
+            return _DISABLED
+        return self._span(stage)
+
+    @contextlib.contextmanager
+    def _span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def observe(self, stage, seconds):
+        """Добавляет замер длительности этапа в секундах"""
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = StageHistogram()
+            histogram.observe(seconds)
+
+    def reset(self):
+        """Удаляет накопленные замеры всех этапов"""
+        with self._lock:
+            self._stages = {}
+
+    def summary(self):
+        """Число замеров, среднее и оценки p50/p95 (мс) по этапам"""
+        with self._lock:
+            return [
+                {
+                    "stage": stage,
+                    "count": histogram.count,
+                    "mean_ms": histogram.total / histogram.count * 1000,
+                    "p50_ms": histogram.quantile(0.5) * 1000,
+                    "p95_ms": histogram.quantile(0.95) * 1000,
+                }
+                for stage, histogram in sorted(self._stages.items())
+            ]
+
+    def prometheus_text(self):
+        """Гистограммы в текстовом формате Prometheus"""
+        name = "booking_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Длительность этапов бронирования и расчета доступности",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self._stages.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}'
+                    )
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.total}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Атомарно записывает гистограммы в файл (для textfile collector)"""
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(temporary, path)
+
+    def start_export(self, path, interval=15):
+        """Запускает поток, записывающий файл path каждые interval секунд"""
+        with self._lock:
+            self.export_path = path
+            if self._exporter is not None and self._exporter.is_alive():
+                return
+            self._exporter = threading.Thread(
+                target=self._export,
+                args=(interval,),
+                name="metrics-export",
+                daemon=True,
+            )
+            self._exporter.start()
+
+    def _export(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.write_prometheus(self.export_path)
+            except OSError as e:
+                logging.error(f"Ошибка записи метрик: {str(e)}")
+
+
+# Общий для всех сессий процесса реестр
+metrics = Metrics()
@@ -0,0 +1,414 @@
+"""Отправка email-уведомлений о бронировании: пул SMTP-соединений и фоновая
+очередь доставки"""
+
+import contextlib
+import functools
+import html
+import json
+import logging
+import os
+import queue
+import string
+import threading
+import time
+import uuid
+
+from metrics import metrics
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+
+class SMTPPool:
+    """Пул авторизованных SMTP-соединений
+
+    Соединения после отправки возвращаются в пул и переиспользуются
+    следующими бронированиями без нового TLS-рукопожатия и входа. Перед
+    выдачей соединение проверяется командой NOOP; разорванные соединения
+    закрываются и заменяются новыми.
+    """
+
+    def __init__(self, host, port, username, password, use_ssl=True, size=2):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.connects = 0
+        self.reuses = 0
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Выдает авторизованное соединение и возвращает его в пул после работы"""
+        with self._slots:
+            server = self._checkout()
+            try:
+                yield server
+            except Exception:
+                # Состояние сессии после ошибки неизвестно, соединение не переиспользуем
+                self._discard(server)
+                raise
+            self._idle.put(server)
+
+    def close(self):
+        """Закрывает все простаивающие соединения"""
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(server)
+
+    def stats(self):
+        """Возвращает число новых подключений и повторных использований"""
+        return {"connects": self.connects, "reuses": self.reuses}
+
+    def _checkout(self):
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if self._is_alive(server):
+                self.reuses += 1
+                return server
+            logging.info("SMTP-соединение из пула разорвано, переподключаемся")
+            self._discard(server)
+
+    def _connect(self):
+        import smtplib
+
+        with metrics.span("smtp.connect"):
+            if self.use_ssl:
+                server = smtplib.SMTP_SSL(self.host, self.port)
+                logging.info(f"Установлено SSL-соединение с {self.host}")
+            else:
+                server = smtplib.SMTP(self.host, self.port)
+                logging.info(f"Установлено соединение с {self.host}")
+
+        try:
+            logging.info(f"Попытка входа с email: {self.username}")
+            with metrics.span("smtp.login"):
+                server.login(self.username, self.password)
+        except Exception:
+            self._discard(server)
+            raise
+        logging.info("Успешная авторизация на SMTP-сервере")
+        self.connects += 1
+        return server
+
+    @staticmethod
+    def _is_alive(server):
+        import smtplib
+
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _discard(server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_smtp_pool(username, password, host="smtp.gmail.com", port=465, use_ssl=True):
+    """Возвращает общий для процесса пул соединений для указанной учетной записи"""
+    key = (host, port, username, password, use_ssl)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = SMTPPool(host, port, username, password, use_ssl=use_ssl)
+        return _pools[key]
+
+
+class EmailTemplate:
+    """Шаблон письма, прочитанный с диска и разобранный один раз
+
+    Подстановки записываются как $имя. В HTML-шаблонах значения
+    экранируются.
+    """
+
+    def __init__(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            self._template = string.Template(f.read())
+        self.is_html = path.endswith(".html")
+
+    def render(self, **context):
+        if self.is_html:
+            context = {key: html.escape(str(value)) for key, value in context.items()}
+        return self._template.substitute(context)
+
+
+@functools.lru_cache(maxsize=None)
+def load_template(name):
+    """Возвращает шаблон из каталога templates (загружается при первом обращении)"""
+    return EmailTemplate(os.path.join(TEMPLATES_DIR, name))
+
+
+def build_booking_messages(sender, slot_time, booker_email, duration="1 час"):
+    """Собирает письма участнику и организатору с общими частями тела
+
+    Текстовая и HTML-версии кодируются один раз и прикрепляются к обоим
+    письмам, которые отличаются только заголовками.
+    """
+    # MIME нужен только при отправке, не загружаем его при старте
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
+    context = {
+        "slot_time": slot_time,
+        "booker_email": booker_email,
+        "duration": duration,
+    }
+    text_part = MIMEText(
+        load_template("booking_confirmation.txt").render(**context), "plain"
+    )
+    html_part = MIMEText(
+        load_template("booking_confirmation.html").render(**context), "html"
+    )
+
+    # Основное сообщение участнику
+    msg = MIMEMultipart("alternative")
+    msg["From"] = sender
+    msg["To"] = booker_email
+    msg["Subject"] = "🎉 Встреча успешно забронирована!"
+    msg.attach(text_part)
+    msg.attach(html_part)
+
+    # Копия организатору
+    msg_copy = MIMEMultipart("alternative")
+    msg_copy["From"] = sender
+    msg_copy["To"] = sender
+    msg_copy["Subject"] = f"📋 Новая встреча: {booker_email}"
+    msg_copy.attach(text_part)
+    msg_copy.attach(html_part)
+
+    return msg, msg_copy
+
+
+def send_booking_emails(pool, slot_time, booker_email, duration="1 час", sent=None):
+    """Отправляет подтверждение участнику и копию организатору
+
+    Соединение берется из пула. В sent записываются имена отправленных писем
+    ("organizer", "attendee"), а уже перечисленные в нем пропускаются, чтобы
+    повторная попытка не дублировала доставленное. При ошибке SMTP исключение
+    пробрасывается, чтобы очередь повторила попытку.
+    """
+    import smtplib
+
+    if sent is None:
+        sent = []
+    msg, msg_copy = build_booking_messages(
+        pool.username, slot_time, booker_email, duration
+    )
+    logging.info(f"Создано сообщение с темой: {msg['Subject']}")
+
+    # Отправляем письмо
+    try:
+        with pool.connection() as server, metrics.span("smtp.send"):
+            # Отправляем копию организатору
+            if "organizer" not in sent:
+                logging.info("Отправка копии организатору...")
+                server.send_message(msg_copy)
+                sent.append("organizer")
+                logging.info("Копия организатору отправлена успешно")
+
+            # Отправляем основное письмо участнику
+            if "attendee" not in sent:
+                logging.info(f"Отправка письма участнику ({booker_email})...")
+                server.send_message(msg)
+                sent.append("attendee")
+                logging.info("Письмо участнику отправлено успешно")
+
+            logging.info("✅ Все уведомления успешно отправлены!")
+
+    except smtplib.SMTPAuthenticationError as auth_error:
+        logging.error(f"Ошибка аутентификации Gmail: {str(auth_error)}")
+        raise
+    except smtplib.SMTPException as smtp_error:
+        logging.error(f"Ошибка SMTP при отправке: {str(smtp_error)}")
+        raise
+
+
+def is_permanent_error(error):
+    """Проверяет, что повтор отправки не поможет (ответ сервера 5xx)
+
+    Ошибка входа не считается постоянной: после исправления пароля
+    отложенные письма должны уйти.
+    """
+    import smtplib
+
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return bool(error.recipients) and all(
+            code >= 500 for code, _ in error.recipients.values()
+        )
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+class EmailOutbox:
+    """Очередь уведомлений с хранением на диске и повторными попытками
+
+    Каждое задание сохраняется JSON-файлом в directory до успешной доставки,
+    поэтому перезапуск процесса не теряет письма. Доставка выполняется
+    фоновым потоком; после неудачи задание повторяется с экспоненциальной
+    задержкой, а после max_attempts попыток или постоянной ошибки (ответ
+    сервера 5xx) переносится в directory/failed.
+    """
+
+    def __init__(self, directory, max_attempts=5, backoff=30, poll_interval=5):
+        self.directory = directory
+        self.failed_directory = os.path.join(directory, "failed")
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+        self._deliver = None
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, deliver):
+        """Запускает фоновую доставку, если она еще не запущена
+
+        deliver(job) отправляет письма задания и вызывается из фонового
+        потока, поэтому не должен обращаться к интерфейсу Streamlit. Список
+        job["sent"] сохраняется между попытками: в него записываются уже
+        отправленные письма, чтобы повтор их пропустил.
+        """
+        with self._lock:
+            self._deliver = deliver
+            if self._thread is None or not self._thread.is_alive():
+                os.makedirs(self.failed_directory, exist_ok=True)
+                self._thread = threading.Thread(
+                    target=self._run, name="email-outbox", daemon=True
+                )
+                self._thread.start()
+
+    def enqueue(self, payload):
+        """Сохраняет задание на диск, ставит его в очередь и возвращает id"""
+        job = {
+            "id": uuid.uuid4().hex,
+            "payload": payload,
+            "attempts": 0,
+            "sent": [],
+            "next_attempt": time.time(),
+            "last_error": None,
+        }
+        os.makedirs(self.failed_directory, exist_ok=True)
+        self._save(job)
+        self._schedule(job["id"])
+        return job["id"]
+
+    def pending(self):
+        """Возвращает количество недоставленных заданий"""
+        return len(self._job_ids())
+
+    def _run(self):
+        # Досылаем задания, оставшиеся на диске после перезапуска
+        self._schedule_due()
+        while True:
+            try:
+                job_id = self._queue.get(timeout=self.poll_interval)
+            except queue.Empty:
+                self._schedule_due()
+                continue
+
+            with self._lock:
+                self._queued.discard(job_id)
+            self._process(job_id)
+
+    def _process(self, job_id):
+        job = self._load(job_id)
+        if job is None or job["next_attempt"] > time.time():
+            return
+
+        with self._lock:
+            deliver = self._deliver
+
+        # Задания, сохраненные до появления списка отправленных писем
+        job.setdefault("sent", [])
+        try:
+            deliver(job)
+        except Exception as e:
+            job["attempts"] += 1
+            job["last_error"] = str(e)
+            if is_permanent_error(e):
+                logging.error(f"Письмо {job_id} отклонено сервером: {str(e)}")
+                self._save(job, self.failed_directory)
+                os.remove(self._path(job_id))
+                return
+            if job["attempts"] >= self.max_attempts:
+                logging.error(
+                    f"Письмо {job_id} не доставлено после {job['attempts']} попыток: {str(e)}"
+                )
+                self._save(job, self.failed_directory)
+                os.remove(self._path(job_id))
+                return
+
+            delay = self.backoff * 2 ** (job["attempts"] - 1)
+            job["next_attempt"] = time.time() + delay
+            logging.warning(
+                f"Повторная отправка письма {job_id} через {delay} с: {str(e)}"
+            )
+            self._save(job)
+            return
+
+        os.remove(self._path(job_id))
+
+    def _schedule(self, job_id):
+        with self._lock:
+            if job_id in self._queued:
+                return
+            self._queued.add(job_id)
+        self._queue.put(job_id)
+
+    def _schedule_due(self):
+        now = time.time()
+        for job_id in self._job_ids():
+            job = self._load(job_id)
+            if job is not None and job["next_attempt"] <= now:
+                self._schedule(job_id)
+
+    def _job_ids(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return [
+            name[: -len(".json")]
+            for name in os.listdir(self.directory)
+            if name.endswith(".json")
+        ]
+
+    def _path(self, job_id, directory=None):
+        return os.path.join(directory or self.directory, f"{job_id}.json")
+
+    def _load(self, job_id):
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _save(self, job, directory=None):
+        # Пишем во временный файл и переименовываем, чтобы не оставить
+        # на диске наполовину записанное задание
+        path = self._path(job["id"], directory)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+# Модули сохраняются между перезапусками скрипта Streamlit, поэтому
+# очередь и ее поток общие для всех сессий процесса
+email_outbox = EmailOutbox(os.path.join(os.getcwd(), "outbox"))
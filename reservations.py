@@ -0,0 +1,215 @@
+"""Локальное резервирование слотов от двойного бронирования"""
+
+import contextlib
+import sqlite3
+import threading
+import time
+
+# Сколько секунд держится резерв, если бронирование не завершилось
+PENDING_TTL = 300
+
+# Как часто резервирование заодно удаляет истекшие резервы из памяти, секунд
+PURGE_INTERVAL = 60
+
+
+class SlotReservations:
+    """Таблица резервов слотов в памяти процесса с семантикой compare-and-set
+
+    Перед обращением к Calendar API сессия резервирует интервал встречи.
+    Резерв получает только одна сессия: интервал отклоняется, если
+    [start - buffer, end + buffer) пересекается с действующим резервом другого
+    владельца (buffer — зазор между встречами в минутах, как в Schedule).
+    Незавершенный резерв истекает через pending_ttl секунд, подтвержденный
+    держится до конца слота. Истекшие записи удаляются при резервировании
+    не чаще раза в purge_interval секунд.
+    """
+
+    def __init__(
+        self, pending_ttl=PENDING_TTL, buffer=0, purge_interval=PURGE_INTERVAL
+    ):
+        self.pending_ttl = pending_ttl
+        self.buffer = buffer
+        self.purge_interval = purge_interval
+        self._lock = threading.Lock()
+        # начало слота -> (владелец, начало, конец, истекает в, подтвержден)
+        self._entries = {}
+        self._last_purge = time.time()
+
+    def reserve(self, start, end, owner):
+        """Резервирует интервал [start, end) за owner; False, если он
+        пересекается с резервом другого владельца с учетом зазора"""
+        key = start.isoformat()
+        start_at = start.timestamp()
+        end_at = end.timestamp()
+        buffer = self.buffer * 60
+        now = time.time()
+        with self._lock:
+            if now - self._last_purge >= self.purge_interval:
+                self._purge(now)
+            for entry in self._entries.values():
+                if (
+                    entry[0] != owner
+                    and entry[3] > now
+                    and entry[1] < end_at + buffer
+                    and entry[2] + buffer > start_at
+                ):
+                    return False
+            self._entries[key] = (
+                owner,
+                start_at,
+                end_at,
+                now + self.pending_ttl,
+                False,
+            )
+            return True
+
+    def confirm(self, start, owner, until):
+        """Отмечает слот забронированным до момента until (datetime)"""
+        key = start.isoformat()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == owner:
+                self._entries[key] = entry[:3] + (until.timestamp(), True)
+
+    def release(self, start, owner):
+        """Снимает резерв owner (например, если событие не удалось создать)"""
+        key = start.isoformat()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == owner:
+                del self._entries[key]
+
+    def purge_expired(self):
+        """Удаляет истекшие резервы"""
+        with self._lock:
+            self._purge(time.time())
+
+    def _purge(self, now):
+        # Вызывается под self._lock
+        for key, entry in list(self._entries.items()):
+            if entry[3] <= now:
+                del self._entries[key]
+        self._last_purge = now
+
+
+class SQLiteSlotReservations:
+    """Таблица резервов в SQLite для нескольких процессов на одном сервере
+
+    Та же семантика, что у SlotReservations; истекшие записи удаляются
+    в транзакции каждого резервирования.
+    """
+
+    def __init__(self, path, pending_ttl=PENDING_TTL, buffer=0):
+        self.path = path
+        self.pending_ttl = pending_ttl
+        self.buffer = buffer
+        with self._transaction() as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS reservations (
+                    slot TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    confirmed INTEGER NOT NULL DEFAULT 0,
+                    start_at REAL,
+                    end_at REAL
+                )
+                """)
+            columns = {
+                row[1] for row in connection.execute("PRAGMA table_info(reservations)")
+            }
+            if "start_at" not in columns:
+                # Файл прежней версии: резервы без интервала не участвуют в
+                # проверке пересечений, поэтому удаляем их
+                connection.execute("ALTER TABLE reservations ADD COLUMN start_at REAL")
+                connection.execute("ALTER TABLE reservations ADD COLUMN end_at REAL")
+                connection.execute("DELETE FROM reservations")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS reservations_expires_at "
+                "ON reservations (expires_at)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS reservations_start_at "
+                "ON reservations (start_at)"
+            )
+
+    def reserve(self, start, end, owner):
+        """Резервирует интервал [start, end) за owner; False, если он
+        пересекается с резервом другого владельца с учетом зазора"""
+        start_at = start.timestamp()
+        end_at = end.timestamp()
+        buffer = self.buffer * 60
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM reservations WHERE expires_at <= ?", (now,))
+            row = connection.execute(
+                "SELECT 1 FROM reservations "
+                "WHERE owner != ? AND start_at < ? AND end_at > ? LIMIT 1",
+                (owner, end_at + buffer, start_at - buffer),
+            ).fetchone()
+            if row is not None:
+                return False
+            connection.execute(
+                "INSERT OR REPLACE INTO reservations "
+                "(slot, owner, expires_at, confirmed, start_at, end_at) "
+                "VALUES (?, ?, ?, 0, ?, ?)",
+                (start.isoformat(), owner, now + self.pending_ttl, start_at, end_at),
+            )
+            return True
+
+    def confirm(self, start, owner, until):
+        """Отмечает слот забронированным до момента until (datetime)"""
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE reservations SET expires_at = ?, confirmed = 1 "
+                "WHERE slot = ? AND owner = ?",
+                (until.timestamp(), start.isoformat(), owner),
+            )
+
+    def release(self, start, owner):
+        """Снимает резерв owner (например, если событие не удалось создать)"""
+        with self._transaction() as connection:
+            connection.execute(
+                "DELETE FROM reservations WHERE slot = ? AND owner = ?",
+                (start.isoformat(), owner),
+            )
+
+    def purge_expired(self):
+        """Удаляет истекшие резервы"""
+        with self._transaction() as connection:
+            connection.execute(
+                "DELETE FROM reservations WHERE expires_at <= ?", (time.time(),)
+            )
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE сразу берет блокировку на запись, поэтому проверка
+        # и запись резерва выполняются атомарно для всех процессов
+        connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_reservations(db_path=None, buffer=0):
+    """Возвращает общую для процесса таблицу резервов (в SQLite, если указан путь)
+
+    buffer — зазор между встречами в минутах.
+    """
+    with _tables_lock:
+        if db_path not in _tables:
+            if db_path:
+                _tables[db_path] = SQLiteSlotReservations(db_path, buffer=buffer)
+            else:
+                _tables[db_path] = SlotReservations(buffer=buffer)
+        return _tables[db_path]
@@ -0,0 +1,41 @@
+"""Сетка слотов одним пользовательским компонентом Streamlit"""
+
+import os
+
+import streamlit.components.v1 as components
+
+_component = components.declare_component(
+    "slot_picker",
+    path=os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "components", "slot_picker"
+    ),
+)
+
+
+def grid_payload(slot_grid, day_count):
+    """Компактное описание первых day_count дней сетки для компонента
+
+    Каждый день — [заголовок, минуты от эпохи, подписи, маска занятости
+    строкой из "0" и "1"].
+    """
+    days = []
+    for day_index in range(day_count):
+        day = slot_grid.day(day_index)
+        minutes, labels, busy = [], [], []
+        for slot, is_busy in day:
+            minutes.append(int(slot.timestamp()) // 60)
+            labels.append(f"{slot:%H:%M}")
+            busy.append("1" if is_busy else "0")
+        title = f"{day.date:%d/%m/%Y} · {day.date:%A}"
+        days.append([title, minutes, labels, "".join(busy)])
+    return days
+
+
+def slot_picker(slot_grid, day_count, key=None):
+    """Отрисовывает первые day_count дней сетки и возвращает выбор пользователя
+
+    Значение — словарь {"minutes": начало слота в минутах от эпохи, "nonce":
+    метка клика} или None, если слот еще не выбирали. Значение сохраняется
+    между перезапусками, новый клик отличается по nonce.
+    """
+    return _component(days=grid_payload(slot_grid, day_count), key=key, default=None)
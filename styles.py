@@ -0,0 +1,55 @@
+"""Подключение стилей страницы из статического файла"""
+
+import functools
+import hashlib
+import os
+
+import streamlit.components.v1 as components
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STYLESHEET = "styles.css"
+
+# Streamlit отдает .css из static/ как text/plain с nosniff, поэтому браузер
+# не примет его через <link>. Скрипт загружает файл и один раз добавляет его
+# в <style> родительской страницы; при перезапусках скрипта iframe не
+# пересоздается, а новый ?v= появляется только при изменении файла.
+_LOADER = """
+<script>
+    const doc = window.parent.document;
+    const href = new URL("%(href)s", window.parent.location.href).href;
+    let style = doc.getElementById("app-styles");
+    if (!style || style.dataset.href !== href) {
+        fetch(href)
+            .then((response) => response.text())
+            .then((css) => {
+                if (!style) {
+                    style = doc.createElement("style");
+                    style.id = "app-styles";
+                    doc.head.appendChild(style);
+                }
+                style.textContent = css;
+                style.dataset.href = href;
+            });
+    }
+</script>
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def stylesheet_url(name=STYLESHEET, mtime=None):
+    """Адрес файла static/name с хешем содержимого в параметре v
+
+    С параметром v статический обработчик Streamlit (Tornado) отдает файл
+    с заголовком Cache-Control на 10 лет, поэтому браузер загружает его
+    один раз на версию.
+    """
+    with open(os.path.join(STATIC_DIR, name), "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    return f"app/static/{name}?v={digest}"
+
+
+def inject_styles(name=STYLESHEET):
+    """Подключает таблицу стилей к странице (при каждом запуске — пара сотен байт)"""
+    # Время изменения в ключе кэша: отредактированный файл получает новый хеш
+    mtime = os.path.getmtime(os.path.join(STATIC_DIR, name))
+    components.html(_LOADER % {"href": stylesheet_url(name, mtime)}, height=0)